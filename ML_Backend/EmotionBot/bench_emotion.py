@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+CPU benchmark for the local go_emotions engine.
+
+Classifies user messages from StrategyBot/test.csv with the full-precision and
+the int8-quantised model and reports:
+
+- per-message latency of single (unbatched) calls for both models,
+- how often the quantised model's emotions (above emotion_detection's 0.5
+  threshold) match the full-precision ones,
+- throughput of --concurrency concurrent callers through EmotionEngine's
+  micro-batching, with the cache disabled so every call reaches the model.
+
+Usage:
+    python bench_emotion.py [--messages 200] [--concurrency 32]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from EmotionBot.engine import EmotionEngine, EmotionModel
+from StrategyBot.utils import load_labelled_conversations, parse_conversation
+
+
+def _user_messages(limit: int):
+    rows = load_labelled_conversations(os.path.join(BASE_DIR, "StrategyBot", "test.csv"))
+    messages = []
+    for row in rows:
+        turns = parse_conversation(row["text"])
+        if turns and turns[-1]["role"] == "usr" and turns[-1]["content"] not in messages:
+            messages.append(turns[-1]["content"])
+        if len(messages) == limit:
+            break
+    return messages
+
+
+def _single_latency(model: EmotionModel, messages):
+    latencies, results = [], []
+    for text in messages:
+        start = time.perf_counter()
+        results.append(model.classify([text])[0])
+        latencies.append(time.perf_counter() - start)
+    return latencies, results
+
+
+def _emotions(scores):
+    return {label for label, p in scores if p > 0.5}
+
+
+async def _throughput(engine: EmotionEngine, messages, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(text):
+        async with semaphore:
+            await engine.classify(text)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call(text) for text in messages))
+    return len(messages) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU benchmark for the go_emotions engine")
+    parser.add_argument("--messages", type=int, default=200, help="User messages to classify")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent callers")
+    args = parser.parse_args()
+
+    messages = _user_messages(args.messages)
+    models = {"fp32": EmotionModel(quantize=False), "int8": EmotionModel(quantize=True)}
+
+    results = {}
+    print(f"{len(messages)} messages, device {models['fp32'].device}\n")
+    print(f"{'model':<6} | {'mean':>8} | {'p95':>8} | {'batched calls/s':>15}")
+    print("-" * 48)
+    for name, model in models.items():
+        latencies, results[name] = _single_latency(model, messages)
+        engine = EmotionEngine(model, cache_size=0)
+        throughput = asyncio.run(_throughput(engine, messages, args.concurrency))
+        print(
+            f"{name:<6} | {statistics.mean(latencies) * 1000:6.1f}ms | "
+            f"{sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000:6.1f}ms | "
+            f"{throughput:15.1f}"
+        )
+
+    same = sum(_emotions(a) == _emotions(b) for a, b in zip(results["fp32"], results["int8"]))
+    print(f"\nint8 emotions identical to fp32 for {same}/{len(messages)} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,31 @@
-from transformers import pipeline
+import sys
+import os
+
+# Points to the parent directory containing EmotionBot, StrategyBot, TherapyBot
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
 import asyncio
 import json
-import os
-import torch
-from transformers import pipeline
 from huggingface_hub import InferenceClient
 
-# Check if GPU is available
-use_local_model = torch.cuda.is_available()
+# "local": run the model in-process (EmotionBot/engine.py), int8-quantised on CPU
+# "server": ask the host's model server (model_server.py, MODEL_SERVER_SOCKET)
+# "api": send each message to the Hugging Face Inference API
+EMOTION_BACKEND = os.getenv(
+    "EMOTION_BACKEND", "server" if os.getenv("MODEL_SERVER_SOCKET") else "local"
+).lower()
+use_local_model = EMOTION_BACKEND == "local"
 
-if use_local_model:
-    # Load the model locally
-    emotion_model = pipeline(
-        task="text-classification", model="SamLowe/roberta-base-go_emotions", top_k=None
-    )
+if EMOTION_BACKEND == "server":
+    from model_client import get_model_client
+
+    model_client = get_model_client()
+elif use_local_model:
+    from EmotionBot.engine import get_emotion_engine
+
+    # Load the model locally, before gunicorn forks its workers
+    emotion_engine = get_emotion_engine()
 else:
     key = os.getenv("HUGGINGFACE_API_KEY")
 
@@ -28,19 +40,22 @@ else:
 async def emotion_detection(query):
     """
     Detects the emotion in the input query.
-    Uses local model if GPU is available, otherwise uses Hugging Face Inference API.
+    Uses the local model (in-process or on the model server) unless
+    EMOTION_BACKEND=api, which uses the Hugging Face Inference API.
     """
+    if EMOTION_BACKEND == "server":
+        (results,) = await asyncio.to_thread(model_client.classify_emotions, [query])
+        return [label for label, probability in results if probability > 0.5]
     if use_local_model:
-        results = emotion_model(query, top_k=3)
+        results = await emotion_engine.classify(query)
         final_result = []
-        for result in results:
-            label = result["label"]
-            probability = result["score"]
+        for label, probability in results:
             if probability > 0.5:
                 final_result.append(label)
         return final_result
     else:
-        results = hf_client.text_classification(query, top_k=3)
+        # The client call blocks, so keep it off the event loop
+        results = await asyncio.to_thread(hf_client.text_classification, query, top_k=3)
         final_result = []
         for result in results:
             label = result["label"]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory benchmark for the shared embedding service.
+
+Each variant runs in a fresh subprocess, so resident memory is measured from
+the same starting point:
+
+- legacy: two HuggingFaceEmbeddings instances, as a process importing two of
+  the old modules (e.g. the books RAG and pair_people) used to hold,
+- shared: the EmbeddingService from get_embeddings(), fetched twice,
+- shared-int8: the same with its Linear layers quantised to int8 (CPU only).
+
+Sentences are the messages of StrategyBot/test.csv, which vary in length
+like real chat messages.
+
+Usage:
+    python bench_embeddings.py [--sentences 1000] [--variants legacy shared shared-int8]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _sentences(limit: int):
+    from StrategyBot.utils import load_labelled_conversations, parse_conversation
+
+    rows = load_labelled_conversations(os.path.join(BASE_DIR, "StrategyBot", "test.csv"))
+    sentences = []
+    for row in rows:
+        for message in parse_conversation(row["text"]):
+            if message["content"] and message["content"] not in sentences:
+                sentences.append(message["content"])
+                if len(sentences) == limit:
+                    return sentences
+    return sentences
+
+
+def run_variant(variant: str, limit: int) -> dict:
+    sentences = _sentences(limit)
+    import torch  # noqa: F401  (count the torch import in the baseline, not the model)
+
+    baseline = _rss_mb()
+    if variant == "legacy":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        name = "sentence-transformers/all-mpnet-base-v2"
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        models = [
+            HuggingFaceEmbeddings(model_name=name, model_kwargs={"device": device})
+            for _ in range(2)
+        ]
+    else:
+        from RAG.embedding_service import EmbeddingService
+
+        service = EmbeddingService(quantize=variant == "shared-int8")
+        service.load()
+        models = [service, service]
+    loaded = _rss_mb()
+
+    models[0].embed_documents(sentences[:32])  # warm-up
+    start = time.perf_counter()
+    models[0].embed_documents(sentences)
+    elapsed = time.perf_counter() - start
+    return {
+        "variant": variant,
+        "sentences_per_s": len(sentences) / elapsed,
+        "model_mb": loaded - baseline,
+        "rss_mb": _rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared embedding service")
+    parser.add_argument("--sentences", type=int, default=1000, help="Sentences to embed")
+    parser.add_argument(
+        "--variants", nargs="+", default=["legacy", "shared", "shared-int8"],
+        choices=["legacy", "shared", "shared-int8"],
+    )
+    parser.add_argument("--run", help=argparse.SUPPRESS)  # one variant, in a subprocess
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_variant(args.run, args.sentences)))
+        return
+
+    print(f"{'variant':<12} | {'sentences/s':>11} | {'model RSS':>9} | {'total RSS':>9}")
+    print("-" * 52)
+    for variant in args.variants:
+        output = subprocess.run(
+            [sys.executable, __file__, "--run", variant, "--sentences", str(args.sentences)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{variant:<12} | {result['sentences_per_s']:11.1f} | "
+            f"{result['model_mb']:7.0f}MB | {result['rss_mb']:7.0f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+One shared all-mpnet-base-v2 embedding model per process.
+
+The books RAG, the memory index, the strategy examples, the RAG ingestion
+script and the pair_people services all embed with
+sentence-transformers/all-mpnet-base-v2. Each used to build its own
+HuggingFaceEmbeddings at import, so a process importing two of them held two
+copies of the model. They now share the EmbeddingService from
+`get_embeddings()`:
+
+- the model is loaded on the first embedding call (or an explicit `load()`),
+  not at import;
+- texts are embedded in batches of EMBEDDING_BATCH_SIZE sorted by length, so
+  each batch pads to similar lengths, and returned in the input order;
+- on CPU, EMBEDDING_QUANTIZE=1 quantises the model's Linear layers to int8.
+  This is faster and smaller, but the vectors differ slightly from the fp32
+  ones already stored in the Chroma collections and Mongo, so it is off by
+  default.
+
+EmbeddingService is a LangChain `Embeddings`, so it can be passed to Chroma
+as the embedding function. With MODEL_SERVER_SOCKET set, get_embeddings()
+returns a client of the host's model server (model_server.py) instead, and
+the process never loads the model or torch.
+"""
+
+import os
+import threading
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-mpnet-base-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "0") == "1"
+
+
+class EmbeddingService(Embeddings):
+    """Lazily loaded sentence-transformers model with length-sorted batching."""
+
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+        quantize: bool = EMBEDDING_QUANTIZE,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.quantize = quantize
+        self._model = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Load the model now (e.g. before gunicorn forks) instead of on first use."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load_model()
+        return self._model
+
+    def _load_model(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"[EMBEDDINGS] Loading {self.model_name} on {device}")
+        model = SentenceTransformer(self.model_name, device=device)
+        if device == "cpu" and self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model.eval()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        model = self.load()
+        # As HuggingFaceEmbeddings did, so vectors match the ones already stored
+        texts = [text.replace("\n", " ") for text in texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = model.encode(
+                [texts[i] for i in batch],
+                batch_size=len(batch),
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            for i, vector in zip(batch, encoded):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    # LangChain Embeddings interface
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+
+_service: Optional[EmbeddingService] = None
+
+
+def get_embeddings() -> "EmbeddingService":
+    """Return the process-wide EmbeddingService (the model itself loads on first use)."""
+    global _service
+    if _service is None:
+        if os.getenv("MODEL_SERVER_SOCKET"):
+            from model_client import RemoteEmbeddings, get_model_client
+
+            _service = RemoteEmbeddings(get_model_client())
+        else:
+            _service = EmbeddingService()
+    return _service
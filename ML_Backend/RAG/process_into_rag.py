@@ -1,11 +1,13 @@
 import os
 import json
 import argparse
-import torch
+import sys
 from langchain.text_splitter import CharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RAG.embedding_service import get_embeddings
+
 
 def ingest_text_to_chroma(
     json_file: str, persist_dir: str, collection_name: str = "rag_docs"
@@ -29,16 +31,9 @@ def ingest_text_to_chroma(
     with open(json_file, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"[INFO] Torch device set to: {device}")
-
-    # 2. Initialize embeddings (HuggingFace in this example)
-    #    You can replace with OpenAIEmbeddings if you prefer.
-    embedding_model = "sentence-transformers/all-mpnet-base-v2"
-    print(f"[INFO] Using HuggingFace Embeddings: {embedding_model}")
-    embeddings = HuggingFaceEmbeddings(
-        model_name=embedding_model, model_kwargs={"device": device}
-    )
+    # 2. Initialize embeddings (the shared all-mpnet-base-v2 service)
+    embeddings = get_embeddings()
+    print(f"[INFO] Using HuggingFace Embeddings: {embeddings.model_name}")
 
     # 3. Create or load an existing Chroma DB
     #    `persist_directory` allows us to save the index to disk.
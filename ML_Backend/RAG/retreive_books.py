@@ -1,15 +1,13 @@
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-import torch
 import os
 from typing import Tuple, List
 
-# 1) Set up your embedding model
-embedding_model = "sentence-transformers/all-mpnet-base-v2"
-embeddings = HuggingFaceEmbeddings(
-    model_name=embedding_model,
-    model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
-)
+from RAG.embedding_service import get_embeddings
+
+# 1) Set up your embedding model (shared with the other all-mpnet-base-v2 users)
+embeddings = get_embeddings()
+# Every chat turn queries the books, so load it now (before gunicorn forks)
+embeddings.load()
 
 # 2) Load the existing Chroma DB from the local folder
 vectordb = Chroma(
@@ -0,0 +1,135 @@
+"""
+Combined emotion and strategy analysis in one Gemini call.
+
+The separate path sends every new user message to two services: the GoEmotions
+classifier (EmotionBot) and the strategy prompt (StrategyBot/bot.py). Here the
+strategy prompt (fixed or dynamic, see STRATEGY_PROMPT) is extended to also
+label the newest user message with GoEmotions emotions, and the answer is
+constrained to a JSON schema so it parses without the regex. If the answer
+still does not parse (e.g. cut off at max_output_tokens), analyze_turn returns
+None and the caller falls back to the separate path.
+
+Selected per deployment with ANALYSIS_MODE=combined (see TherapyBot/agent_stream.py).
+It always uses the Gemini strategy prompt, so it cannot be combined with
+STRATEGY_BACKEND=local or hybrid.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import google.generativeai as genai
+
+from StrategyBot.bot import _executor, _gemini_prompt, _record_usage, model
+from StrategyBot.utils import format_conversation, format_messages
+
+logger = logging.getLogger(__name__)
+
+# Labels of SamLowe/roberta-base-go_emotions, as returned by emotion_detection
+GO_EMOTIONS = [
+    "admiration", "amusement", "anger", "annoyance", "approval", "caring",
+    "confusion", "curiosity", "desire", "disappointment", "disapproval", "disgust",
+    "embarrassment", "excitement", "fear", "gratitude", "grief", "joy", "love",
+    "nervousness", "optimism", "pride", "realization", "relief", "remorse",
+    "sadness", "surprise", "neutral",
+]
+STRATEGIES = [
+    "Question", "Restatement or Paraphrasing", "Reflection of feelings",
+    "Self-disclosure", "Affirmation and Reassurance", "Providing Suggestions",
+    "Information", "Others",
+]
+
+emotion_instructions = """
+
+Also identify the emotions expressed in the newest user message, using only these labels: {labels}. Give at most three, strongest first, or "neutral" if none apply.
+
+Respond only with JSON, with no text outside it: "reasoning" (your reasoning for the strategies, briefly), "strategies" (the predicted strategies) and "emotions"."""
+
+analysis_config = genai.GenerationConfig(
+    temperature=0.25,
+    # As the separate strategy call: the reasoning alone can be a few hundred tokens
+    max_output_tokens=768,
+    response_mime_type="application/json",
+    response_schema={
+        "type": "OBJECT",
+        "properties": {
+            "reasoning": {"type": "STRING"},
+            "strategies": {"type": "ARRAY", "items": {"type": "STRING", "enum": STRATEGIES}},
+            "emotions": {"type": "ARRAY", "items": {"type": "STRING", "enum": GO_EMOTIONS}},
+        },
+        "required": ["reasoning", "strategies", "emotions"],
+    },
+)
+
+
+def _analyze(conversation: str) -> Optional[dict]:
+    prompt = _gemini_prompt(conversation) + emotion_instructions.format(
+        labels=", ".join(GO_EMOTIONS)
+    )
+    response = model.generate_content(prompt, generation_config=analysis_config)
+    _record_usage(response)
+    try:
+        # .text raises ValueError too when the response has no text (e.g. blocked)
+        result = json.loads(response.text)
+    except ValueError as exc:
+        logger.warning("[ANALYSIS] Unparseable response, falling back: %s", exc)
+        return None
+    return result if isinstance(result, dict) else None
+
+
+async def analyze_turn(history: list) -> Optional[Tuple[List[str], str, List[str]]]:
+    """
+    Emotions of the newest user message plus the strategies to answer it with.
+
+    Args:
+        history (list): Same input as predict_therapy_strategy, ending with the
+            newest user message
+
+    Returns:
+        tuple: (emotions, reasoning, strategies), or None if the model's answer
+            could not be parsed; run the separate emotion and strategy paths then
+    """
+    if not isinstance(history[0], dict):
+        conversation = format_messages(history)
+    else:
+        conversation = format_conversation(history)
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_executor, _analyze, conversation)
+    if result is None:
+        return None
+    emotions = [e for e in result.get("emotions", []) if e in GO_EMOTIONS][:3]
+    strategies = [s for s in result.get("strategies", []) if s in STRATEGIES]
+    return (emotions, result.get("reasoning", "").strip(), strategies)
+
+
+async def __main__():
+    history = [
+        {
+            "role": "sys",
+            "strategy": ["Question"],
+            "content": "Hello! Hope you are doing well. How may I assist you?",
+        },
+        {
+            "role": "usr",
+            "content": "I am feeling very sad today. My dog passed away and I am devastated.",
+        },
+    ]
+    analysis = await analyze_turn(history)
+    if analysis is None:
+        print("Could not parse the response")
+        return
+    emotions, reasoning, strategies = analysis
+    print(emotions)
+    print(reasoning)
+    print(strategies)
+
+
+if __name__ == "__main__":
+    asyncio.run(__main__())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Sequential latency benchmark for predict_therapy_strategy.
+
+Sends the same conversation --calls times (default 1000) one after another and
+reports latency per block of calls. With a stateless request per prediction
+the blocks should stay flat; with a shared chat session every call resends all
+earlier ones and latency climbs steadily.
+
+Makes real Gemini calls (needs GOOGLE_API_KEY).
+
+Usage:
+    python bench_strategy.py [--calls 1000] [--block 100]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from StrategyBot.bot import predict_therapy_strategy
+
+HISTORY = [
+    {
+        "role": "sys",
+        "strategy": ["Question"],
+        "content": "Hello! Hope you are doing well. How may I assist you?",
+    },
+    {
+        "role": "usr",
+        "content": "I have been feeling really low since I moved to a new city for work.",
+    },
+    {
+        "role": "sys",
+        "strategy": ["Reflection of feelings"],
+        "content": "Moving somewhere new can feel lonely, especially at first.",
+    },
+    {
+        "role": "usr",
+        "content": "Yeah, I don't know anyone here and weekends are the worst.",
+    },
+]
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run(calls: int, block: int):
+    latencies = []
+    errors = 0
+
+    print(f"{'calls':>11} | {'mean':>7} | {'p50':>7} | {'p95':>7} | errors")
+    print("-" * 52)
+    for i in range(1, calls + 1):
+        start = time.perf_counter()
+        try:
+            await predict_therapy_strategy(HISTORY)
+        except Exception as e:
+            errors += 1
+            print(f"call {i} failed: {e}")
+        latencies.append(time.perf_counter() - start)
+
+        if i % block == 0 or i == calls:
+            window = latencies[-(((i - 1) % block) + 1):]
+            print(
+                f"{i - len(window) + 1:>5}-{i:<5} | {statistics.mean(window):6.2f}s | "
+                f"{_percentile(window, 0.5):6.2f}s | {_percentile(window, 0.95):6.2f}s | {errors}"
+            )
+            errors = 0
+
+    first = latencies[:block]
+    last = latencies[-block:]
+    print("-" * 52)
+    print(
+        f"mean of first {len(first)}: {statistics.mean(first):.2f}s, "
+        f"last {len(last)}: {statistics.mean(last):.2f}s "
+        f"(x{statistics.mean(last) / statistics.mean(first):.2f})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sequential latency benchmark for StrategyBot")
+    parser.add_argument("--calls", type=int, default=1000, help="Number of predictions")
+    parser.add_argument("--block", type=int, default=100, help="Calls per reported block")
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.block))
@@ -7,6 +7,7 @@ sys.path.insert(0, BASE_DIR)
 
 import google.generativeai as genai
 import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor
 from StrategyBot.utils import format_conversation, format_messages
 import re
@@ -125,55 +126,88 @@ Final Answer: Information, Reflection of feelings
 Based on the above, predict the strategies for the following conversation.
 
 Input:\n"""
-chat_session = model.start_chat(
-    history=[
-        {
-            "role": "user",
-            "parts": [system_prompt],
-        },
-    ]
+# Compact prompt for STRATEGY_PROMPT=dynamic: the instructions above without the
+# four fixed examples, followed by the most similar labelled examples from
+# val.csv (see examples.py)
+compact_system_prompt = """Your task is to analyze a conversation and predict the therapy strategies to respond to the newest user message. The possible strategies are: Question, Restatement or Paraphrasing, Reflection of feelings, Self-disclosure, Affirmation and Reassurance, Providing Suggestions, Information, and Others. Try not to use too many strategies at once. Answer in this format:
+
+Reasoning: <one or two sentences on how the conversation leads to your prediction>
+Final Answer: <comma-separated list of strategies>
+
+Examples of conversations and the strategies used next:
+
+{examples}
+
+Predict the strategies for the following conversation.
+
+Input:
+"""
+# fixed   - system_prompt with its four hand-written examples (default)
+# dynamic - compact_system_prompt with the STRATEGY_FEW_SHOT_K most similar examples
+STRATEGY_PROMPT = os.getenv("STRATEGY_PROMPT", "fixed").lower()
+
+# Token counts of the Gemini calls made by this process
+gemini_usage = {"calls": 0, "prompt_tokens": 0, "output_tokens": 0}
+_usage_lock = threading.Lock()
+
+# Every prediction is an independent request: the few-shot prompt above plus
+# that conversation's window. Nothing is shared between calls or users.
+#
+# generate_content blocks, so calls run on one long-lived pool sized for the
+# expected number of concurrent predictions.
+STRATEGY_MAX_WORKERS = int(os.getenv("STRATEGY_MAX_WORKERS", "16"))
+_executor = ThreadPoolExecutor(
+    max_workers=STRATEGY_MAX_WORKERS, thread_name_prefix="strategybot"
 )
 
 
-async def predict_therapy_strategy(history: list):
+# Which model picks the strategies:
+#   gemini - the few-shot Gemini prompt above (default)
+#   local  - the classifier in classifier.py, trained on val.csv (milliseconds on CPU)
+#   hybrid - the local classifier, falling back to Gemini when its top strategy's
+#            probability is below STRATEGY_LOCAL_MIN_CONFIDENCE
+STRATEGY_BACKEND = os.getenv("STRATEGY_BACKEND", "gemini").lower()
+STRATEGY_LOCAL_MIN_CONFIDENCE = float(os.getenv("STRATEGY_LOCAL_MIN_CONFIDENCE", "0.6"))
+
+# Load (or build) the local models once at import, before gunicorn forks its workers
+if STRATEGY_BACKEND in ("local", "hybrid"):
+    from StrategyBot.classifier import get_local_classifier
+
+    get_local_classifier()
+if STRATEGY_BACKEND != "local" and STRATEGY_PROMPT == "dynamic":
+    from StrategyBot.examples import get_example_store
+
+    get_example_store()
+
+
+async def predict_therapy_strategy(history: list, backend: str = None):
     """
-    Predicts therapy strategies based on conversation history using Gemini API.
+    Predicts therapy strategies based on conversation history.
 
     Args:
-        user_message (str): The latest message in the conversation to analyze
-        api_key (str): Gemini API key
+        history (list): Annotated message dicts (see format_conversation) or
+            LangChain messages, ending with the newest user message
+        backend (str): "gemini", "local" or "hybrid"; defaults to STRATEGY_BACKEND
 
     Returns:
-        str: The API response containing predicted therapy strategies
+        tuple: (reasoning, list of predicted strategies)
     """
+    backend = (backend or STRATEGY_BACKEND).lower()
     try:
-        conversation = ""
         if not isinstance(history[0], dict):
             conversation = format_messages(history)
         else:
             conversation = format_conversation(history)
-        # Since send_message is not actually async, we'll run it in a thread pool
-        # print(conversation)
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as pool:
-            response = await loop.run_in_executor(
-                pool, chat_session.send_message, conversation
-            )
-            # print(response)
-        pattern = re.compile(
-            r"(?s)Reasoning:\s*(?P<reasoning>.*?)\s*Final Answer:\s*(?P<strategy>.+)$"
-        )
-
-        match = pattern.search(response.text)
-        # print(match)
-        reasoning = ""
-        strategy_list = []
-        if match:
-            reasoning = match.group("reasoning").strip()
-            # Split the strategy string by comma and strip each element
-            strategy_list = [s.strip() for s in match.group("strategy").split(",")]
-            # print(reasoning, strategy_list)
-        return (reasoning, strategy_list)
+
+        if backend in ("local", "hybrid"):
+            from StrategyBot.classifier import get_local_classifier
+
+            strategy_list, confidence = get_local_classifier().predict(conversation)
+            if backend == "local" or confidence >= STRATEGY_LOCAL_MIN_CONFIDENCE:
+                reasoning = f"Predicted by the local strategy classifier (confidence {confidence:.2f})."
+                return (reasoning, strategy_list)
+
+        return await _predict_with_gemini(conversation)
 
     except KeyError as e:
         raise ValueError(f"Missing required API key: {str(e)}")
@@ -181,6 +215,51 @@ async def predict_therapy_strategy(history: list):
         raise Exception(f"Error in prediction: {str(e)}")
 
 
+def _gemini_prompt(conversation: str) -> str:
+    if STRATEGY_PROMPT != "dynamic":
+        return system_prompt + conversation
+    from StrategyBot.examples import format_examples, get_example_store
+
+    examples = get_example_store().select(conversation)
+    return compact_system_prompt.format(examples=format_examples(examples)) + conversation
+
+
+def _record_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        with _usage_lock:
+            gemini_usage["calls"] += 1
+            gemini_usage["prompt_tokens"] += usage.prompt_token_count
+            gemini_usage["output_tokens"] += usage.candidates_token_count
+
+
+def _generate(conversation: str):
+    response = model.generate_content(_gemini_prompt(conversation))
+    _record_usage(response)
+    return response
+
+
+async def _predict_with_gemini(conversation: str):
+    loop = asyncio.get_running_loop()
+    # Selecting examples embeds the conversation, so it runs on the pool too
+    response = await loop.run_in_executor(_executor, _generate, conversation)
+    # print(response)
+    pattern = re.compile(
+        r"(?s)Reasoning:\s*(?P<reasoning>.*?)\s*Final Answer:\s*(?P<strategy>.+)$"
+    )
+
+    match = pattern.search(response.text)
+    # print(match)
+    reasoning = ""
+    strategy_list = []
+    if match:
+        reasoning = match.group("reasoning").strip()
+        # Split the strategy string by comma and strip each element
+        strategy_list = [s.strip() for s in match.group("strategy").split(",")]
+        # print(reasoning, strategy_list)
+    return (reasoning, strategy_list)
+
+
 # Example usage:
 async def __main__():
 
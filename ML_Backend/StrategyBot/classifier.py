@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Local multi-label strategy classifier, trained on the bundled ESConv splits.
+
+Each row of val.csv / test.csv is a conversation that ends with a user message,
+labelled with the strategies of the supporter's next reply. The classifier
+looks at what matters most for that choice:
+
+- the last user message (word 1-2 grams),
+- the supporter's previous reply and the user message before it,
+- the strategies already used, the previous reply's strategies and how far
+  into the conversation we are (as tag tokens).
+
+TF-IDF features feed a one-vs-rest logistic regression, so a prediction is a
+few sparse dot products: well under a millisecond per conversation on CPU.
+
+Usage:
+    python classifier.py [--train val.csv] [--eval test.csv] [--out strategy_classifier.joblib]
+"""
+
+import os
+import sys
+import time
+import argparse
+import logging
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from StrategyBot.utils import load_labelled_conversations, parse_conversation
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+STRATEGY_MODEL_PATH = os.getenv(
+    "STRATEGY_MODEL_PATH", os.path.join(STRATEGY_DIR, "strategy_classifier.joblib")
+)
+# A strategy is predicted when its probability reaches this; the most likely
+# strategy is always predicted
+STRATEGY_LABEL_THRESHOLD = float(os.getenv("STRATEGY_LABEL_THRESHOLD", "0.5"))
+
+
+def _tag(strategy: str) -> str:
+    return strategy.lower().replace(" ", "_")
+
+
+def conversation_features(text: str) -> Dict[str, str]:
+    """Split a formatted conversation into the text fields the classifier uses."""
+    messages = parse_conversation(text)
+    last_user = ""
+    if messages and messages[-1]["role"] == "usr":
+        last_user = messages.pop()["content"]
+
+    previous_reply, previous_user = "", ""
+    previous_strategies: List[str] = []
+    for msg in reversed(messages):
+        if msg["role"] == "sys" and not previous_reply:
+            previous_reply = msg["content"]
+            previous_strategies = msg.get("strategy") or []
+        elif msg["role"] == "usr" and previous_reply:
+            previous_user = msg["content"]
+            break
+
+    used = {s for msg in messages for s in msg.get("strategy") or []}
+    tags = [f"turn_{min(len(messages) // 2, 10)}"]
+    tags += [f"prev_{_tag(s)}" for s in previous_strategies]
+    tags += [f"used_{_tag(s)}" for s in sorted(used)]
+    return {
+        "last_user": last_user,
+        "context": f"{previous_user} {previous_reply}".strip(),
+        "tags": " ".join(tags),
+    }
+
+
+def _field(rows: List[Dict[str, str]], name: str) -> List[str]:
+    # Pickled by reference with the pipeline, so it must be loaded from
+    # StrategyBot.classifier (see main)
+    return [row[name] for row in rows]
+
+
+def _build_pipeline():
+    from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.multiclass import OneVsRestClassifier
+    from sklearn.pipeline import FeatureUnion, make_pipeline
+    from sklearn.preprocessing import FunctionTransformer
+
+    def field(name, vectorizer):
+        return make_pipeline(FunctionTransformer(partial(_field, name=name)), vectorizer)
+
+    features = FeatureUnion([
+        ("last_user", field("last_user", TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True))),
+        ("context", field("context", TfidfVectorizer(min_df=2, sublinear_tf=True, max_features=20000))),
+        ("tags", field("tags", CountVectorizer(token_pattern=r"\S+", binary=True))),
+    ])
+    classifier = OneVsRestClassifier(
+        LogisticRegression(C=4.0, class_weight="balanced", max_iter=2000)
+    )
+    return make_pipeline(features, classifier)
+
+
+class LocalStrategyClassifier:
+    """Fitted pipeline plus the strategy names its outputs correspond to."""
+
+    def __init__(self, pipeline, classes: List[str], threshold: float = STRATEGY_LABEL_THRESHOLD):
+        self.pipeline = pipeline
+        self.classes = list(classes)
+        self.threshold = threshold
+
+    @classmethod
+    def train(cls, rows: List[Dict]) -> "LocalStrategyClassifier":
+        """Fit on rows from load_labelled_conversations."""
+        from sklearn.preprocessing import MultiLabelBinarizer
+
+        binarizer = MultiLabelBinarizer()
+        y = binarizer.fit_transform([row["labels"] for row in rows])
+        pipeline = _build_pipeline()
+        pipeline.fit([conversation_features(row["text"]) for row in rows], y)
+        return cls(pipeline, binarizer.classes_)
+
+    def predict_many(self, conversations: List[str]) -> List[Tuple[List[str], float]]:
+        """(strategies, confidence) per conversation; confidence is the top strategy's probability."""
+        probabilities = self.pipeline.predict_proba(
+            [conversation_features(text) for text in conversations]
+        )
+        results = []
+        for row in probabilities:
+            order = row.argsort()[::-1]
+            strategies = [self.classes[i] for i in order if row[i] >= self.threshold]
+            results.append((strategies or [self.classes[order[0]]], float(row[order[0]])))
+        return results
+
+    def predict(self, conversation: str) -> Tuple[List[str], float]:
+        return self.predict_many([conversation])[0]
+
+    def save(self, path: str = STRATEGY_MODEL_PATH):
+        import joblib
+
+        joblib.dump({"pipeline": self.pipeline, "classes": self.classes}, path)
+
+    @classmethod
+    def load(cls, path: str = STRATEGY_MODEL_PATH) -> "LocalStrategyClassifier":
+        import joblib
+
+        data = joblib.load(path)
+        return cls(data["pipeline"], data["classes"])
+
+
+_classifier: Optional[LocalStrategyClassifier] = None
+
+
+def get_local_classifier() -> LocalStrategyClassifier:
+    """
+    Return the process-wide classifier, loading it from STRATEGY_MODEL_PATH on
+    first use. Without a saved model it is trained from val.csv (a few seconds)
+    and saved for next time.
+    """
+    global _classifier
+    if _classifier is None:
+        if os.path.exists(STRATEGY_MODEL_PATH):
+            _classifier = LocalStrategyClassifier.load(STRATEGY_MODEL_PATH)
+        else:
+            logger.info("[STRATEGY] No model at %s, training one", STRATEGY_MODEL_PATH)
+            _classifier = LocalStrategyClassifier.train(
+                load_labelled_conversations(os.path.join(STRATEGY_DIR, "val.csv"))
+            )
+            try:
+                _classifier.save(STRATEGY_MODEL_PATH)
+            except OSError as exc:
+                logger.warning("[STRATEGY] Could not save model: %s", exc)
+    return _classifier
+
+
+def _report(classifier: LocalStrategyClassifier, rows: List[Dict]):
+    from StrategyBot.evaluate import print_scores
+
+    start = time.perf_counter()
+    predictions = classifier.predict_many([row["text"] for row in rows])
+    elapsed = time.perf_counter() - start
+    print_scores([row["labels"] for row in rows], [p for p, _ in predictions])
+    print(f"\nbatch inference: {elapsed / len(rows) * 1000:.3f} ms per conversation")
+
+    start = time.perf_counter()
+    for row in rows[:200]:
+        classifier.predict(row["text"])
+    single = (time.perf_counter() - start) / min(len(rows), 200)
+    print(f"single inference: {single * 1000:.3f} ms per conversation")
+
+
+def main():
+    # When run as a script this module is __main__. The pipeline pickles _field by
+    # module path, so train through the importable module, or the saved model
+    # could only be loaded by this script.
+    from StrategyBot.classifier import LocalStrategyClassifier, _report
+
+    parser = argparse.ArgumentParser(description="Train the local StrategyBot classifier")
+    parser.add_argument("--train", default=os.path.join(STRATEGY_DIR, "val.csv"), help="Training split")
+    parser.add_argument("--eval", default=os.path.join(STRATEGY_DIR, "test.csv"), help="Held-out split")
+    parser.add_argument("--out", default=STRATEGY_MODEL_PATH, help="Where to save the model")
+    args = parser.parse_args()
+
+    rows = load_labelled_conversations(args.train)
+    start = time.perf_counter()
+    classifier = LocalStrategyClassifier.train(rows)
+    print(f"trained on {len(rows)} rows in {time.perf_counter() - start:.1f}s")
+    classifier.save(args.out)
+    print(f"saved to {args.out}")
+
+    eval_rows = load_labelled_conversations(args.eval)
+    # Round trip: the saved model must load and predict exactly as the trained one
+    texts = [row["text"] for row in eval_rows[:200]]
+    if LocalStrategyClassifier.load(args.out).predict_many(texts) != classifier.predict_many(texts):
+        raise SystemExit(f"{args.out} does not reproduce the trained model's predictions")
+    print("reloaded model matches\n")
+    _report(classifier, eval_rows)
+
+
+if __name__ == "__main__":
+    main()
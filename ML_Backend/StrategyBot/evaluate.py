@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of predict_therapy_strategy on the labelled ESConv splits.
+
+Streams val.csv or test.csv through a strategy backend (gemini, local or
+hybrid, see STRATEGY_BACKEND in bot.py) with at most --concurrency predictions
+in flight, and reports:
+
+- exact-match accuracy (predicted set == labelled set) and top-strategy accuracy,
+- precision and recall per strategy,
+- latency percentiles and calls per second.
+
+Responses are cached per backend configuration and conversation in --cache, so
+a rerun (or a run with a larger --limit) only pays for the rows it has not
+seen. The configuration includes the Gemini prompt, the local model file's
+contents and the classifier thresholds, so retraining the classifier or
+changing STRATEGY_LOCAL_MIN_CONFIDENCE starts a fresh cache. Cached
+rows count towards the accuracy numbers but not the latency and throughput
+numbers. Gemini and hybrid runs make real Gemini calls (need GOOGLE_API_KEY)
+and also report the mean input and output tokens per call, e.g. to compare
+--prompt fixed with --prompt dynamic. The dynamic prompt's examples come from
+val.csv, so compare prompts on test.
+
+Usage:
+    python evaluate.py [--backend local] [--split test] [--prompt dynamic] [--limit 500] [--concurrency 8]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from StrategyBot.utils import load_labelled_conversations, parse_conversation
+
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE = os.path.join(STRATEGY_DIR, "eval_cache.jsonl")
+
+
+# ---------- Scoring ----------
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def print_scores(gold: List[List[str]], predicted: List[List[str]]):
+    """Exact-match and top-strategy accuracy, then precision/recall per strategy."""
+    total = len(gold)
+    exact = sum(set(p) == set(g) for g, p in zip(gold, predicted))
+    top_hit = sum(bool(p) and p[0] in g for g, p in zip(gold, predicted))
+    print(f"rows: {total}")
+    print(f"exact match: {exact / total:.3f}")
+    print(f"top strategy correct: {top_hit / total:.3f}")
+
+    labels = sorted({label for g in gold for label in g})
+    unknown = sum(label not in labels for p in predicted for label in p)
+    print(f"\n{'strategy':<30} {'precision':>9} {'recall':>7} {'support':>7}")
+    for label in labels:
+        tp = sum(label in p and label in g for g, p in zip(gold, predicted))
+        predicted_count = sum(label in p for p in predicted)
+        support = sum(label in g for g in gold)
+        precision = tp / predicted_count if predicted_count else 0.0
+        recall = tp / support if support else 0.0
+        print(f"{label:<30} {precision:9.3f} {recall:7.3f} {support:7d}")
+    if unknown:
+        print(f"predicted strategies outside the label set: {unknown}")
+
+
+def print_latency(latencies: List[float], elapsed: float):
+    if not latencies:
+        print("\nno uncached calls; latency not measured")
+        return
+    print(
+        f"\nlatency over {len(latencies)} calls: "
+        f"p50 {_percentile(latencies, 0.5) * 1000:.1f}ms | "
+        f"p95 {_percentile(latencies, 0.95) * 1000:.1f}ms | "
+        f"p99 {_percentile(latencies, 0.99) * 1000:.1f}ms"
+    )
+    print(f"throughput: {len(latencies) / elapsed:.2f} calls/s")
+
+
+# ---------- Response cache ----------
+
+class ResponseCache:
+    """Append-only JSONL file of predictions keyed by backend and conversation."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._entries: Dict[str, List[str]] = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._entries[entry["key"]] = entry["strategies"]
+
+    @staticmethod
+    def key(backend: str, text: str) -> str:
+        return f"{backend}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[List[str]]:
+        return self._entries.get(key)
+
+    def put(self, key: str, strategies: List[str]):
+        self._entries[key] = strategies
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "strategies": strategies}) + "\n")
+
+
+# ---------- Evaluation ----------
+
+def _file_digest(path: str) -> str:
+    if not os.path.exists(path):
+        return "unsaved"
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def cache_name(backend: str, prompt: str) -> str:
+    """Cache namespace covering everything a backend's predictions depend on."""
+    if backend == "gemini":
+        return f"gemini/{prompt}"
+    from StrategyBot.bot import STRATEGY_LOCAL_MIN_CONFIDENCE
+    from StrategyBot.classifier import (
+        STRATEGY_LABEL_THRESHOLD,
+        STRATEGY_MODEL_PATH,
+        get_local_classifier,
+    )
+
+    get_local_classifier()  # trains and saves the model if there is none yet
+    local = f"model={_file_digest(STRATEGY_MODEL_PATH)},threshold={STRATEGY_LABEL_THRESHOLD}"
+    if backend == "local":
+        return f"local/{local}"
+    return f"{backend}/{prompt}/{local},min_confidence={STRATEGY_LOCAL_MIN_CONFIDENCE}"
+
+
+async def evaluate(
+    rows: List[Dict], backend: str, concurrency: int, cache: ResponseCache
+):
+    from StrategyBot.bot import STRATEGY_PROMPT, gemini_usage, predict_therapy_strategy
+
+    namespace = cache_name(backend, STRATEGY_PROMPT)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    predictions: List[Optional[List[str]]] = [None] * len(rows)
+    failures = 0
+
+    async def run(i: int, row: Dict):
+        nonlocal failures
+        key = cache.key(namespace, row["text"])
+        cached = cache.get(key)
+        if cached is not None:
+            predictions[i] = cached
+            return
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                _, strategies = await predict_therapy_strategy(
+                    parse_conversation(row["text"]), backend=backend
+                )
+            except Exception as e:
+                failures += 1
+                print(f"row {i} failed: {e}")
+                return
+            latencies.append(time.perf_counter() - start)
+        predictions[i] = strategies
+        cache.put(key, strategies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(i, row) for i, row in enumerate(rows)))
+    elapsed = time.perf_counter() - start
+
+    scored = [(row["labels"], p) for row, p in zip(rows, predictions) if p is not None]
+    print(f"backend: {namespace}, concurrency: {concurrency}")
+    print(f"cached: {len(scored) - len(latencies)}, failed: {failures}\n")
+    if scored:
+        print_scores([g for g, _ in scored], [p for _, p in scored])
+    print_latency(latencies, elapsed)
+    if gemini_usage["calls"]:
+        print(
+            f"gemini: {gemini_usage['calls']} calls, "
+            f"{gemini_usage['prompt_tokens'] / gemini_usage['calls']:.0f} input and "
+            f"{gemini_usage['output_tokens'] / gemini_usage['calls']:.0f} output tokens per call"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate StrategyBot on the ESConv splits")
+    parser.add_argument(
+        "--backend",
+        choices=["gemini", "local", "hybrid"],
+        default=os.getenv("STRATEGY_BACKEND", "gemini"),
+        help="Strategy backend to evaluate",
+    )
+    parser.add_argument(
+        "--prompt",
+        choices=["fixed", "dynamic"],
+        help="Gemini prompt: fixed examples or examples picked per conversation (STRATEGY_PROMPT)",
+    )
+    parser.add_argument("--split", choices=["val", "test"], default="test", help="Labelled split")
+    parser.add_argument("--limit", type=int, help="Only evaluate the first N rows")
+    parser.add_argument("--concurrency", type=int, default=8, help="Predictions in flight")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="Response cache file")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not write the cache")
+    args = parser.parse_args()
+
+    if args.prompt:
+        os.environ["STRATEGY_PROMPT"] = args.prompt  # read when bot.py is imported
+
+    rows = load_labelled_conversations(os.path.join(STRATEGY_DIR, f"{args.split}.csv"))
+    # A few rows have no conversation at all (the supporter opens)
+    rows = [row for row in rows if row["text"].strip()][: args.limit]
+    cache = ResponseCache(None if args.no_cache else args.cache)
+    asyncio.run(evaluate(rows, args.backend, args.concurrency, cache))
+
+
+if __name__ == "__main__":
+    main()
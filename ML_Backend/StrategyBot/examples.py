@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Few-shot example store for the compact StrategyBot prompt.
+
+Every labelled conversation in val.csv becomes a candidate example: its last
+few messages plus the strategies of the reply that followed. Examples are
+embedded once (the newest user message and the reply before it, which is
+what drives the choice of strategy) and saved next to this file. For each
+prediction the most similar examples from different conversations are put in
+the prompt in place of the four long hand-written ones.
+
+Usage:
+    python examples.py [--rebuild]
+"""
+
+import os
+import sys
+import json
+import argparse
+import logging
+from typing import Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np
+
+from StrategyBot.utils import format_conversation, load_labelled_conversations, parse_conversation
+
+logger = logging.getLogger(__name__)
+
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _npz_path(path: str) -> str:
+    # np.savez appends .npz to paths without it, so save and load the same name
+    return path if path.endswith(".npz") else path + ".npz"
+
+
+STRATEGY_EXAMPLES_PATH = _npz_path(
+    os.getenv("STRATEGY_EXAMPLES_PATH", os.path.join(STRATEGY_DIR, "strategy_examples.npz"))
+)
+# Messages of each example shown in the prompt (its newest ones)
+STRATEGY_EXAMPLE_MESSAGES = int(os.getenv("STRATEGY_EXAMPLE_MESSAGES", "6"))
+STRATEGY_FEW_SHOT_K = int(os.getenv("STRATEGY_FEW_SHOT_K", "2"))
+
+
+def _embeddings():
+    """The shared all-mpnet-base-v2 model (also used by the books RAG)."""
+    from RAG.embedding_service import get_embeddings
+    return get_embeddings()
+
+
+def _unit(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def query_text(messages: List[Dict]) -> str:
+    """The part of a conversation examples are matched on: the last reply and user message."""
+    last_user = messages[-1]["content"] if messages and messages[-1]["role"] == "usr" else ""
+    previous_reply = next(
+        (m["content"] for m in reversed(messages[:-1]) if m["role"] == "sys"), ""
+    )
+    return f"{previous_reply}\n{last_user}".strip()
+
+
+class ExampleStore:
+    """Labelled example conversations with unit-length embeddings, one row each."""
+
+    def __init__(self, examples: List[Dict], vectors: np.ndarray):
+        # examples: {"conversation": str, "strategies": [...], "source": int}
+        self.examples = examples
+        self.vectors = vectors
+
+    @classmethod
+    def build(cls, rows: List[Dict]) -> "ExampleStore":
+        """Embed the rows of a labelled split (load_labelled_conversations)."""
+        examples, queries = [], []
+        source, previous_length = 0, 0
+        for row in rows:
+            messages = parse_conversation(row["text"])
+            # Rows of one conversation are consecutive and each extends the
+            # previous; remember which conversation an example comes from so
+            # a prompt never shows two overlapping windows of it
+            if len(messages) <= previous_length:
+                source += 1
+            previous_length = len(messages)
+            if not messages or messages[-1]["role"] != "usr":
+                continue
+            examples.append({
+                "conversation": format_conversation(messages[-STRATEGY_EXAMPLE_MESSAGES:]),
+                "strategies": row["labels"],
+                "source": source,
+            })
+            queries.append(query_text(messages))
+        vectors = _unit(_embeddings().embed_documents(queries))
+        return cls(examples, vectors)
+
+    def select(self, conversation: str, k: int = STRATEGY_FEW_SHOT_K) -> List[Dict]:
+        """The k examples most similar to a formatted conversation, from different conversations."""
+        query = query_text(parse_conversation(conversation))
+        if not query or k <= 0:
+            return []
+        scores = self.vectors @ _unit(_embeddings().embed_query(query))
+        selected, sources = [], set()
+        for i in np.argsort(-scores):
+            example = self.examples[i]
+            if example["source"] in sources:
+                continue
+            selected.append(example)
+            sources.add(example["source"])
+            if len(selected) == k:
+                break
+        return selected
+
+    def save(self, path: str = STRATEGY_EXAMPLES_PATH):
+        np.savez(_npz_path(path), vectors=self.vectors, examples=np.array(json.dumps(self.examples)))
+
+    @classmethod
+    def load(cls, path: str = STRATEGY_EXAMPLES_PATH) -> "ExampleStore":
+        with np.load(_npz_path(path)) as data:
+            return cls(json.loads(str(data["examples"])), data["vectors"])
+
+
+def format_examples(examples: List[Dict]) -> str:
+    return "\n\n".join(
+        f"Example {i}:\nInput:\n{example['conversation']}\n"
+        f"Final Answer: {', '.join(example['strategies'])}"
+        for i, example in enumerate(examples, 1)
+    )
+
+
+_store: Optional[ExampleStore] = None
+
+
+def get_example_store() -> ExampleStore:
+    """
+    Return the process-wide example store, loading it from STRATEGY_EXAMPLES_PATH
+    on first use. Without a saved store it is built from val.csv (embeds every
+    row, about a minute on CPU) and saved for next time.
+    """
+    global _store
+    if _store is None:
+        if os.path.exists(STRATEGY_EXAMPLES_PATH):
+            _store = ExampleStore.load(STRATEGY_EXAMPLES_PATH)
+        else:
+            logger.info("[STRATEGY] No example store at %s, building one", STRATEGY_EXAMPLES_PATH)
+            _store = ExampleStore.build(
+                load_labelled_conversations(os.path.join(STRATEGY_DIR, "val.csv"))
+            )
+            try:
+                _store.save(STRATEGY_EXAMPLES_PATH)
+            except OSError as exc:
+                logger.warning("[STRATEGY] Could not save example store: %s", exc)
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the StrategyBot few-shot example store")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if a store exists")
+    args = parser.parse_args()
+
+    if args.rebuild and os.path.exists(STRATEGY_EXAMPLES_PATH):
+        os.remove(STRATEGY_EXAMPLES_PATH)
+    store = get_example_store()
+    print(f"{len(store.examples)} examples, {store.vectors.shape[1]}-dim embeddings at {STRATEGY_EXAMPLES_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -70,6 +70,43 @@ def format_conversation(messages: List[Dict]) -> str:
     return "\n".join(formatted_messages)
 
 
+# A turn marker in a formatted conversation: "usr:" or "sys:" / "sys(Strategy, ...):"
+_TURN_MARKER = re.compile(r"(?:^|\s)(usr|sys)(?:\(([^)]*)\))?:(?:\s|$)")
+
+
+def parse_conversation(text: str) -> List[Dict]:
+    """
+    Inverse of format_conversation: split a formatted conversation (turns joined by
+    newlines, or by spaces as in val.csv / test.csv) back into message dicts.
+    """
+    markers = list(_TURN_MARKER.finditer(text or ""))
+    messages = []
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        role, strategies = marker.group(1), marker.group(2)
+        message = {"role": role, "content": text[marker.end():end].strip()}
+        if role == "sys":
+            message["strategy"] = [s.strip() for s in strategies.split(",")] if strategies else []
+        messages.append(message)
+    return messages
+
+
+def load_labelled_conversations(path: str) -> List[Dict]:
+    """
+    Read a `text,label` split (val.csv / test.csv): each row is a formatted
+    conversation ending with a user message, labelled with the strategies of the
+    reply that followed. Returns dicts with "text" and "labels".
+    """
+    import ast
+    import csv
+
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            {"text": row["text"], "labels": ast.literal_eval(row["label"])}
+            for row in csv.DictReader(f)
+        ]
+
+
 def extract_strategies(system_message):
     match = re.search(r"strategy_list: \[(.*?)\]", system_message.content)
     return match.group(1) if match else ""
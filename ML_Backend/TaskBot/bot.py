@@ -12,6 +12,7 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.messages import HumanMessage
 import json
 from typing import List
+from pydantic import BaseModel
 from TaskBot.utils import Task, Journey, JourneySchema, json_task
 from langchain_core.prompts import PromptTemplate
 from TaskBot.prompts import (
@@ -41,7 +42,9 @@ class Taskbot:
 
     async def create_task(self, reason, tasks: List[Task]):
         tasks_json = json.dumps(
-            [task.model_dump() for task in tasks], ensure_ascii=False, indent=2
+            [task.model_dump() if isinstance(task, BaseModel) else task for task in tasks],
+            ensure_ascii=False,
+            indent=2,
         )
         # print(f"tasks_json: {tasks_json}\nReason: {reason}")
         
@@ -52,7 +55,7 @@ class Taskbot:
         while attempts < self.retry_count:
             try:
                 llm_chain = self.create_task_prompt | self.llm
-                result = llm_chain.invoke(
+                result = await llm_chain.ainvoke(
                     input={"reason": reason, "tasks_json": tasks_json}
                 )
                 # print(f"Result: {result}")
@@ -86,7 +89,7 @@ class Taskbot:
         while attempts < self.retry_count:
             try:
                 llm_chain = self.journey_prompt_template | self.llm
-                result = llm_chain.invoke(
+                result = await llm_chain.ainvoke(
                     input={"new_task": tasks_json, "journeys_json": journeys_json}
                 )
                 return result.content.strip()
@@ -110,7 +113,7 @@ class Taskbot:
         while attempts < self.retry_count:
             try:
                 llm_chain = self.task_difficulty_prompt | self.llm
-                result = llm_chain.invoke(input={"reason": reason, "task": task_json})
+                result = await llm_chain.ainvoke(input={"reason": reason, "task": task_json})
                 return result.content.strip()
             except Exception as e:
                 last_exception = e
@@ -1,6 +1,8 @@
 import os
+import time
 import asyncio
 import sys
+from dataclasses import dataclass, replace
 
 # Points to the parent directory containing EmotionBot, StrategyBot, TherapyBot
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -26,13 +28,15 @@ from langchain_core.runnables import (
 )
 from langchain_core.messages import BaseMessage
 from langchain_core.tools import tool
+from langchain.tools import ToolRuntime
 
 # from langchain.agents import AgentType
 from langchain.agents import create_agent
 from langchain.messages import SystemMessage, HumanMessage, AIMessage
 from RAG.retreive_books import query_retriever
 from EmotionBot.bot import emotion_detection
-from StrategyBot.bot import predict_therapy_strategy
+from StrategyBot.bot import STRATEGY_BACKEND, predict_therapy_strategy
+from StrategyBot.analysis import analyze_turn
 from TherapyBot.utils import (
     _extract_config_dict,
     is_probably_json,
@@ -40,12 +44,25 @@ from TherapyBot.utils import (
     user_prompt,
     pet_prompt,
     chat_prompt,
+    turn_context_prompt,
+    summary_prompt,
+    deferred_results_prompt,
 )
 from TaskBot.bot import Taskbot
 from TaskBot.utils import Task
 import json
-from langchain.agents.middleware import SummarizationMiddleware
-from langgraph.checkpoint.memory import InMemorySaver
+from langchain.agents.middleware import (
+    AgentMiddleware,
+    ModelRequest,
+    SummarizationMiddleware,
+)
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from TherapyBot.annotations import AnnotationBuffer
+from TherapyBot.checkpointer import build_checkpointer
+from TherapyBot.compaction import ConversationCompactor
+from TherapyBot.deferred_tools import get_deferred_runner, merge_events
+from TherapyBot.memory_index import get_memory_index
+from TherapyBot.metrics import record, start_trace, traced
 from langchain_core.runnables import RunnableConfig
 
 # from langchain_core.runnables import get_current_config
@@ -106,6 +123,82 @@ class SystemSummaryMiddleware(SummarizationMiddleware):
         messages.append(system_msg)
 
 
+@dataclass
+class TurnContext:
+    """Runtime context of a single chat turn, passed to the agent via `context=`."""
+
+    conversation_id: str
+    user_id: str
+    # User message wrapped with this turn's book excerpts and analysis
+    message_text: str = ""
+
+
+class TurnContextMiddleware(AgentMiddleware):
+    """
+    Swaps the current user message for its context-wrapped version in the model
+    request only. The checkpointed history keeps just the user's own words, so
+    earlier turns' excerpts and analysis are never re-sent.
+    """
+
+    @staticmethod
+    def _inject(request: ModelRequest) -> ModelRequest:
+        context = getattr(request.runtime, "context", None)
+        message_text = getattr(context, "message_text", "")
+        if not message_text:
+            return request
+
+        messages = list(request.messages)
+        for i in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[i], HumanMessage):
+                messages[i] = messages[i].model_copy(update={"content": message_text})
+                break
+        return replace(request, messages=messages)
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._inject(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._inject(request))
+
+
+# Per-stage latency budgets (seconds) for the per-turn analysis fan-out.
+# A stage that overruns its budget (or fails) is skipped and the turn continues
+# with that stage's fallback value, so one slow dependency cannot hold up the reply.
+DEFAULT_STAGE_BUDGETS: Dict[str, float] = {
+    "rag": float(os.getenv("RAG_BUDGET_S", "2.0")),
+    "emotion": float(os.getenv("EMOTION_BUDGET_S", "1.5")),
+    "strategy": float(os.getenv("STRATEGY_BUDGET_S", "3.0")),
+    # ANALYSIS_MODE=combined: emotions and strategy from one call
+    "analysis": float(os.getenv("ANALYSIS_BUDGET_S", "3.0")),
+    "memories": float(os.getenv("MEMORIES_BUDGET_S", "0.5")),
+}
+
+
+async def _run_stage(name: str, coro, budget: float, fallback, skipped: list):
+    """Await a single analysis stage within its latency budget.
+
+    On timeout or error the stage name is appended to `skipped` and `fallback`
+    is returned instead of raising.
+
+    A timeout only stops waiting: blocking work a stage handed to a thread
+    (asyncio.to_thread, StrategyBot's executor) keeps running to completion in
+    that worker thread. So a stage must never wait on its own thread pool on
+    the way out (e.g. `with ThreadPoolExecutor()`, whose exit joins the
+    threads on the event loop), or a timed-out stage blocks the turn anyway.
+    """
+    start = time.perf_counter()
+    try:
+        return await asyncio.wait_for(coro, timeout=budget)
+    except asyncio.TimeoutError:
+        print(f"[STAGE] '{name}' exceeded its {budget:.2f}s budget, skipping")
+    except Exception as e:
+        print(f"[STAGE] '{name}' failed, skipping: {e}")
+    finally:
+        record(name, time.perf_counter() - start)
+    skipped.append(name)
+    return fallback
+
+
 # Module-level TaskBot instance (will be initialized by TherapyAgent)
 _taskbot_instance: Optional[Taskbot] = None
 
@@ -124,12 +217,28 @@ def get_taskbot_instance() -> Taskbot:
     return _taskbot_instance
 
 
-# try making tool runnable? or maybe by customstate or just prompt bs
+# Deferred mode: slow tools reply at once and run in the background (see TherapyBot/deferred_tools.py)
+_defer_slow_tools: bool = False
+
+
+def set_defer_slow_tools(enabled: bool):
+    """Set whether slow tools run in the background."""
+    global _defer_slow_tools
+    _defer_slow_tools = enabled
+
+
+def get_defer_slow_tools() -> bool:
+    """Get whether slow tools run in the background."""
+    return _defer_slow_tools
+
+
+# Tools read the conversation and user ids from the turn's runtime context
+# (TurnContext); the `runtime` argument is injected and not shown to the model.
 @tool("save_memory_to_db")
-def save_memory_to_db(
+@traced("tool:save_memory_to_db")
+async def save_memory_to_db(
     memory: str,
-    conversation_id: str,
-    user_id: str,
+    runtime: ToolRuntime[TurnContext],
     memory_type: str = "info",
 ):
     """Persist a piece of information about the user that should be remembered across sessions.
@@ -147,14 +256,18 @@ def save_memory_to_db(
     Do NOT call this for transient feelings or one-off statements that are not worth keeping
     long-term.
     """
+    conversation_id = runtime.context.conversation_id
+    user_id = runtime.context.user_id
 
     if get_task_debug():
         print(f"[DB MEMORY SAVE] User: {user_id}, type={memory_type}, conv: {conversation_id}")
         print(f"[DB MEMORY SAVE] Content: {memory[:200]}...")
 
     try:
-        from db_client import save_memory
-        save_memory(user_id, conversation_id, memory, memory_type=memory_type)
+        from db_client import asave_memory
+        memory_id = await asave_memory(user_id, conversation_id, memory, memory_type=memory_type)
+        if memory_id:
+            get_memory_index().remember(user_id, memory_id, memory, memory_type)
     except Exception as e:
         if get_task_debug():
             print(f"[DB MEMORY SAVE] DB error: {e}")
@@ -163,8 +276,6 @@ def save_memory_to_db(
         "status": "success",
         "memory": memory,
         "memory_type": memory_type,
-        "user_id": user_id,
-        "conversation_id": conversation_id,
     }
 
 
@@ -188,10 +299,31 @@ def _clean_json_response(response: str) -> str:
 
 
 @tool("create_therapy_task")
-async def create_therapy_task(reason_for_task_creation: str, conversation_id: str, user_id: str):
+async def create_therapy_task(reason_for_task_creation: str, runtime: ToolRuntime[TurnContext]):
     """Create a therapy-related task for the user, based on the given reason.
     This tool uses TaskBot to generate personalized therapy tasks that avoid redundancy
     and are tailored to the user's needs."""
+    conversation_id = runtime.context.conversation_id
+    user_id = runtime.context.user_id
+
+    if get_defer_slow_tools():
+        get_deferred_runner().submit(
+            conversation_id,
+            "create_therapy_task",
+            {"reason_for_task_creation": reason_for_task_creation},
+            runtime.tool_call_id,
+            _create_therapy_task(reason_for_task_creation, conversation_id, user_id),
+        )
+        return (
+            "Task creation has started in the background. Let the user know a task is "
+            "being prepared for them and will appear in their task list shortly."
+        )
+    return await _create_therapy_task(reason_for_task_creation, conversation_id, user_id)
+
+
+@traced("tool:create_therapy_task")
+async def _create_therapy_task(reason_for_task_creation: str, conversation_id: str, user_id: str):
+    """Generate a task with TaskBot, save it and describe it for the agent."""
 
     if get_task_debug():
         print(
@@ -204,8 +336,8 @@ async def create_therapy_task(reason_for_task_creation: str, conversation_id: st
 
     # Fetch existing tasks so TaskBot can avoid redundancy and calibrate difficulty
     try:
-        from db_client import get_user_tasks
-        existing_tasks = get_user_tasks(user_id)
+        from db_client import aget_user_tasks
+        existing_tasks = await aget_user_tasks(user_id)
     except Exception as e:
         if get_task_debug():
             print(f"[THERAPY TASK] Could not fetch existing tasks: {e}")
@@ -255,13 +387,13 @@ async def create_therapy_task(reason_for_task_creation: str, conversation_id: st
 
         # Persist task(s) to MongoDB
         try:
-            from db_client import save_task
+            from db_client import asave_task
             if isinstance(task_data, dict):
-                save_task(user_id, conversation_id, task_data)
+                await asave_task(user_id, conversation_id, task_data)
             elif isinstance(task_data, list):
                 for td in task_data:
                     if isinstance(td, dict):
-                        save_task(user_id, conversation_id, td)
+                        await asave_task(user_id, conversation_id, td)
         except Exception as e:
             if get_task_debug():
                 print(f"[THERAPY TASK] DB save error: {e}")
@@ -317,6 +449,12 @@ class TherapyAgent:
         agent_debug: bool = False,
         task_debug: bool = False,
         checkpoint_debug: bool = False,
+        stage_budgets: Optional[Dict[str, float]] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None,
+        history_rehydrate_limit: int = int(os.getenv("HISTORY_REHYDRATE_LIMIT", "20")),
+        defer_slow_tools: bool = os.getenv("DEFER_SLOW_TOOLS", "0") == "1",
+        deferred_grace_s: float = float(os.getenv("DEFERRED_GRACE_S", "2.0")),
+        analysis_mode: str = os.getenv("ANALYSIS_MODE", "separate"),
     ):
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
@@ -327,9 +465,23 @@ class TherapyAgent:
         self.agent_debug = agent_debug
         self.task_debug = task_debug
         self.checkpoint_debug = checkpoint_debug
+        self.stage_budgets = {**DEFAULT_STAGE_BUDGETS, **(stage_budgets or {})}
+        self.history_rehydrate_limit = history_rehydrate_limit
+        # Deferred tool results finishing within this long after the reply are sent with it
+        self.deferred_grace_s = deferred_grace_s
+        # "separate": EmotionBot + StrategyBot; "combined": one analyze_turn call
+        self.analysis_mode = analysis_mode
+        if analysis_mode not in ("separate", "combined"):
+            raise ValueError(f"Unknown ANALYSIS_MODE {analysis_mode!r}; use 'separate' or 'combined'.")
+        if analysis_mode == "combined" and STRATEGY_BACKEND != "gemini":
+            # The combined call is a Gemini prompt; it would silently bypass the local classifier
+            raise ValueError(
+                f"ANALYSIS_MODE=combined needs STRATEGY_BACKEND=gemini, not {STRATEGY_BACKEND!r}."
+            )
 
         # Set module-level debug flags for tools to access
         set_debug_flags(query_debug, agent_debug, task_debug, checkpoint_debug)
+        set_defer_slow_tools(defer_slow_tools)
 
         self.conversation_llm = ChatGoogleGenerativeAI(
             model="gemini-flash-lite-latest", temperature=0.7
@@ -367,44 +519,43 @@ class TherapyAgent:
             ]
         )
 
-        summarisation_middleware = SystemSummaryMiddleware(
-            model=self.summary_llm,
-            max_tokens_before_summary=4000,
-            messages_to_keep=6,
-            summary_prompt="""Summarize the conversation so far using ONLY information explicitly stated in user or assistant messages.
-
-Rules:
-- DO NOT add interpretation or assumptions.
-- DO NOT infer emotions, fears, or therapy themes unless explicitly mentioned.
-- DO NOT summarize system messages, prompts, or instructions.
-- DO NOT summarize explanations of how to summarize.
-
-
-Include ONLY:
-- User’s explicit requests.
-- Assistant’s explicit responses.
-- Tasks actually created (with difficulty if provided).
-- Any tool calls and their explicit results.
-
-""",
-        )
-        chat_history_checkpointer = InMemorySaver()
+        # Persistent, memory-bounded conversation state (see TherapyBot/checkpointer.py)
+        chat_history_checkpointer = checkpointer or build_checkpointer()
         # Initialize agent for tool calling
         self.agent = create_agent(
             tools=[save_memory_to_db, create_therapy_task],
             model=self.conversation_llm,
             system_prompt=system_prompt.template,
             # agent_type=AgentType.OPENAI_FUNCTIONS,
-            # middleware=[summarisation_middleware],
+            middleware=[TurnContextMiddleware()],
+            context_schema=TurnContext,
             checkpointer=chat_history_checkpointer,
             debug=False,
         )
-        self.agent.checkpointer.storage.clear()
+
+        # Summarises long threads in the background after a turn has finished,
+        # instead of a SummarizationMiddleware call inside the user's turn.
+        self.compactor = ConversationCompactor(
+            self.agent,
+            self.summary_llm,
+            summary_prompt.template,
+            token_threshold=int(os.getenv("COMPACTION_TOKEN_THRESHOLD", "4000")),
+            messages_to_keep=int(os.getenv("COMPACTION_MESSAGES_TO_KEEP", "6")),
+        )
+
+        # Recent annotated turns per conversation, the input to StrategyBot
+        self.annotations = AnnotationBuffer()
 
         print("Agent initialized.\n")
 
     async def chat(self, query: str, conversation_id: str, user_id: str):
         thread_id = conversation_id
+        timings = start_trace()
+        turn_start = time.perf_counter()
+        first_token_seen = False
+        # Background tool results that finished after the previous turn ended;
+        # service.stream_chat forgets them once this turn has been handed to the writer
+        background_events = get_deferred_runner().finished(conversation_id)
 
         # retrieve full or partial history (from checkpointer)
         config = RunnableConfig(
@@ -413,28 +564,37 @@ Include ONLY:
                 "user_id": user_id,
             }
         )
-        checkpoint = self.agent.checkpointer.get(config)
+        checkpoint = await self.agent.checkpointer.aget_tuple(config)
 
-        state = (
-            checkpoint.checkpoint.get("state", {})
-            if checkpoint and hasattr(checkpoint, "checkpoint")
-            else {}
+        # Thread not in the checkpointer (restart / another worker): rebuild it from
+        # the stored messages. It is seeded into the checkpoint with this turn's input.
+        history_seed = (
+            [] if checkpoint else await self._rehydrate_history(conversation_id)
         )
 
-        messages = state.get("messages", []) if isinstance(state, dict) else []
-
-        recent_msgs = messages[-8:]
-
-        # add new message
-        recent_msgs.append(HumanMessage(content=query))
-
-        # concurrent async tasks
-        rag_docs_task = asyncio.create_task(asyncio.to_thread(query_retriever, query))
-        emotion_task = asyncio.create_task(emotion_detection(query))
-        strategy_task = asyncio.create_task(predict_therapy_strategy(recent_msgs))
-
-        emotion_result, strategy_result, rag_result = await asyncio.gather(
-            emotion_task, strategy_task, rag_docs_task
+        # Seed the window from the checkpoint on this process's first turn of the
+        # conversation, or reseed it if other workers have added turns since
+        # (rehydration seeds the window itself)
+        if checkpoint:
+            self.annotations.sync(
+                conversation_id,
+                checkpoint.checkpoint.get("channel_values", {}).get("messages", []),
+            )
+        recent_msgs = self.annotations.recent(conversation_id, query)
+
+        # concurrent async tasks, each bounded by its own latency budget
+        skipped_stages: List[str] = []
+        budgets = self.stage_budgets
+        (emotion_result, strategy_result), rag_result, memories = await asyncio.gather(
+            self._analyse(query, recent_msgs, skipped_stages),
+            _run_stage(
+                "rag", asyncio.to_thread(query_retriever, query),
+                budgets["rag"], ("", []), skipped_stages,
+            ),
+            _run_stage(
+                "memories", get_memory_index().search(user_id, query),
+                budgets["memories"], "", skipped_stages,
+            ),
         )
         combined_context, rag_sources = rag_result  # (str, List[str])
 
@@ -443,34 +603,47 @@ Include ONLY:
                 f"Received the intermediate inputs {emotion_result}, {strategy_result}"
             )
             print(f"RAG sources: {rag_sources}")
+            if skipped_stages:
+                print(f"Skipped stages: {skipped_stages}")
         reasoning, strategy_list = strategy_result
 
+        # Combine all retrieved info into the user message the model sees this turn.
+        # Only the raw query is stored in the history (see TurnContextMiddleware).
+        turn_context = TurnContext(
+            conversation_id=conversation_id,
+            user_id=user_id,
+            message_text=turn_context_prompt.format(
+                input=query,
+                context=combined_context,
+                memories=memories or "Nothing relevant yet.",
+                emotion_result=emotion_result,
+                reasoning_for_strategy=reasoning,
+                strategy_result=strategy_list,
+            ),
+        )
+        if background_events:
+            turn_context.message_text += "\n\n" + deferred_results_prompt.format(
+                results="\n".join(f"- {ev['name']}: {ev['result']}" for ev in background_events)
+            )
+
         response = ""
         tool_events: list = []  # accumulate tool calls made this turn
         attempts, successful, last_exception = 0, False, None
 
         while attempts < self.retry_count and not successful:
             try:
-                # Combine all retrieved info into a single user message string
-                message_text = f"""
-                User Message: {query}
-
-                These are some book excerpts relevant to the user's question:
-                {combined_context}
-
-                **Detected Emotions:** {emotion_result}
-                **Reasoning for strategy:** {reasoning}
-                **Predicted Strategy:** {strategy_list}
-
-                Use these details if you need to call tools :- conversation_id: {conversation_id}, user_id: {user_id}
-                """
-
                 inside_json_block = False  # NEW STATE FLAG
 
                 async for token, metadata in self.agent.astream(
-                    {"messages": [{"role": "user", "content": message_text}]},
+                    {
+                        "messages": [
+                            *history_seed,
+                            {"role": "user", "content": query},
+                        ]
+                    },
                     stream_mode="messages",
                     config=config,
+                    context=turn_context,
                 ):
                     if self.agent_debug:
                         token_type = type(token).__name__
@@ -593,6 +766,9 @@ Include ONLY:
                     if self.agent_debug:
                         print(f"[TOKEN DEBUG] YIELDING: {repr(text[:50])}...")
 
+                    if not first_token_seen:
+                        first_token_seen = True
+                        record("first_token", time.perf_counter() - turn_start)
                     yield text
                     response += text
 
@@ -609,12 +785,23 @@ Include ONLY:
                 last_exception = e
                 attempts += 1
                 print(f"Error on attempt {attempts}: {e}")
+                # Don't seed the history twice if the failed attempt already stored it
+                if history_seed and await self.agent.checkpointer.aget_tuple(config):
+                    history_seed = []
                 await asyncio.sleep(2**attempts)
         if self.checkpoint_debug:
             self.debug_agent(user_id, conversation_id)
         if not successful:
             raise Exception("Failed after retries.") from last_exception
 
+        self.compactor.schedule(config)
+        self.annotations.record_turn(conversation_id, query, response, strategy_list)
+        record("turn", time.perf_counter() - turn_start)
+
+        # Results of tools deferred in an earlier turn; this turn's are merged
+        # in by collect_deferred once the caller has released its chat slot
+        merge_events(tool_events, background_events)
+
         # Yield metadata so app.py can persist the turn and forward tool events
         yield {
             "__metadata__": {
@@ -622,6 +809,8 @@ Include ONLY:
                 "strategies": strategy_list,
                 "tool_events": tool_events,
                 "rag_sources": rag_sources,
+                "skipped_stages": skipped_stages,
+                "timings": timings,
             }
         }
 
@@ -642,6 +831,75 @@ Include ONLY:
         #         reason_for_task_creation=f"Suggested by conversation: {response[:150]}",
         #     )
 
+    async def collect_deferred(self, conversation_id: str, tool_events: List[dict]):
+        """
+        Wait up to deferred_grace_s for the conversation's background tools and
+        merge the finished results into `tool_events`. Called by service.stream_chat
+        after it has released the turn's chat slot, so the wait doesn't hold one.
+        """
+        if not get_defer_slow_tools():
+            return
+        merge_events(
+            tool_events,
+            await get_deferred_runner().collect(conversation_id, self.deferred_grace_s),
+        )
+
+    async def _analyse(self, query: str, recent_msgs: List[dict], skipped_stages: list):
+        """(emotions, (reasoning, strategies)) for the new message, each part within its budget."""
+        budgets = dict(self.stage_budgets)
+        if self.analysis_mode == "combined":
+            deadline = time.perf_counter() + budgets["analysis"]
+            analysis = await _run_stage(
+                "analysis", analyze_turn(recent_msgs),
+                budgets["analysis"], ([], "", []), skipped_stages,
+            )
+            if analysis is not None:
+                emotions, reasoning, strategies = analysis
+                return emotions, (reasoning, strategies)
+            # The answer did not parse: use the separate stages for this turn,
+            # within what is left of the analysis budget
+            remaining = max(0.0, deadline - time.perf_counter())
+            budgets["emotion"] = min(budgets["emotion"], remaining)
+            budgets["strategy"] = min(budgets["strategy"], remaining)
+
+        return await asyncio.gather(
+            _run_stage(
+                "emotion", emotion_detection(query),
+                budgets["emotion"], [], skipped_stages,
+            ),
+            _run_stage(
+                "strategy", predict_therapy_strategy(recent_msgs),
+                budgets["strategy"], ("", []), skipped_stages,
+            ),
+        )
+
+    async def _rehydrate_history(self, conversation_id: str) -> List[BaseMessage]:
+        """Rebuild the last few turns of a conversation from the Mongo messages collection."""
+        if self.history_rehydrate_limit <= 0:
+            return []
+        try:
+            from db_client import aget_recent_messages
+            docs = await aget_recent_messages(conversation_id, self.history_rehydrate_limit)
+        except Exception as e:
+            print(f"[REHYDRATE] Could not load history for {conversation_id}: {e}")
+            return []
+
+        self.annotations.seed_from_docs(conversation_id, docs)
+
+        history: List[BaseMessage] = []
+        for doc in docs:
+            content = doc.get("content") or ""
+            if not content:
+                continue
+            if doc.get("role") == "user":
+                history.append(HumanMessage(content=content))
+            else:
+                history.append(AIMessage(content=content))
+
+        if self.checkpoint_debug:
+            print(f"[REHYDRATE] Restored {len(history)} messages for {conversation_id}")
+        return history
+
     def debug_agent(self, user_id: str, conversation_id: str):
         thread_id = conversation_id
         config = RunnableConfig(
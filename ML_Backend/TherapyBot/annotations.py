@@ -0,0 +1,131 @@
+"""
+Rolling per-conversation window of annotated turns for StrategyBot.
+
+Each conversation keeps its last few user and assistant messages, with the
+strategies the replies were written with, in the dict shape StrategyBot's
+`format_conversation` expects (which has no place for emotions, so none are
+kept). The window is updated at the end of every turn, so building StrategyBot's
+input never reads Mongo. It is seeded from the checkpoint or the stored messages
+when a conversation is first seen by this process, and reseeded from the
+checkpoint when that has turns the window never saw, e.g. because the
+conversation was served by another worker in between.
+"""
+
+import os
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+STRATEGY_WINDOW = int(os.getenv("STRATEGY_WINDOW", "8"))
+ANNOTATION_MAX_CONVERSATIONS = int(os.getenv("ANNOTATION_MAX_CONVERSATIONS", "10000"))
+
+
+def _text(content) -> str:
+    return (content if isinstance(content, str) else str(content or "")).strip()
+
+
+@dataclass
+class _Window:
+    messages: Deque[dict]
+    # Id of the last checkpoint message the window accounts for (None: not anchored
+    # to a checkpoint yet), and the turns recorded since then
+    synced_id: Optional[str] = None
+    new_turns: int = 0
+
+
+class AnnotationBuffer:
+    """Fixed-size ring buffer of recent annotated messages per conversation (LRU-bounded)."""
+
+    def __init__(
+        self,
+        window: int = STRATEGY_WINDOW,
+        max_conversations: int = ANNOTATION_MAX_CONVERSATIONS,
+    ):
+        self.window = window
+        self.max_conversations = max_conversations
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+
+    def __contains__(self, conversation_id: str) -> bool:
+        return conversation_id in self._windows
+
+    def recent(self, conversation_id: str, query: str) -> List[dict]:
+        """The conversation's window followed by the new user message."""
+        window = self._windows.get(conversation_id)
+        if window is not None:
+            self._windows.move_to_end(conversation_id)
+        return [*(window.messages if window else ()), {"role": "usr", "content": query}]
+
+    def record_turn(
+        self,
+        conversation_id: str,
+        user_message: str,
+        reply: str,
+        strategies: Optional[list],
+    ):
+        """Append a finished turn."""
+        window = self._window(conversation_id)
+        if _text(user_message):
+            window.messages.append({"role": "usr", "content": _text(user_message)})
+        if _text(reply):
+            window.messages.append({"role": "sys", "content": _text(reply), "strategy": strategies or []})
+        window.new_turns += 1
+
+    def sync(self, conversation_id: str, messages: List[BaseMessage]):
+        """
+        Bring the window in line with the conversation's checkpointed messages at
+        the start of a turn. The window is kept if the checkpoint holds exactly the
+        turns recorded since it was last synced, and reseeded from the checkpoint
+        (losing the older annotations) otherwise.
+        """
+        window = self._windows.get(conversation_id)
+        if window is None or not self._in_sync(window, messages):
+            self.seed_from_messages(conversation_id, messages)
+            window = self._windows[conversation_id]
+        window.synced_id = messages[-1].id if messages else None
+        window.new_turns = 0
+
+    @staticmethod
+    def _in_sync(window: _Window, messages: List[BaseMessage]) -> bool:
+        if window.synced_id is None:
+            # Seeded from stored messages, which the checkpoint was just built from
+            return window.new_turns <= 1
+        ids = [msg.id for msg in messages]
+        if window.synced_id not in ids:
+            return False
+        since = messages[ids.index(window.synced_id) + 1:]
+        return sum(isinstance(msg, HumanMessage) for msg in since) == window.new_turns
+
+    def seed_from_docs(self, conversation_id: str, docs: List[dict]):
+        """Start a conversation's window from stored Message documents (oldest first)."""
+        window = self._window(conversation_id, reset=True)
+        for doc in docs:
+            content = _text(doc.get("content"))
+            if not content:
+                continue
+            if doc.get("role") == "user":
+                window.messages.append({"role": "usr", "content": content})
+            else:
+                window.messages.append({"role": "sys", "content": content, "strategy": doc.get("strategyUsed") or []})
+
+    def seed_from_messages(self, conversation_id: str, messages: List[BaseMessage]):
+        """Start a conversation's window from checkpointed messages (no annotations)."""
+        window = self._window(conversation_id, reset=True)
+        for msg in messages:
+            content = _text(msg.content)
+            if not content:
+                continue  # e.g. AI messages that only carry tool calls
+            if isinstance(msg, HumanMessage):
+                window.messages.append({"role": "usr", "content": content})
+            elif isinstance(msg, AIMessage):
+                window.messages.append({"role": "sys", "content": content})
+
+    def _window(self, conversation_id: str, reset: bool = False) -> _Window:
+        window = self._windows.get(conversation_id)
+        if window is None or reset:
+            window = self._windows[conversation_id] = _Window(deque(maxlen=self.window))
+        self._windows.move_to_end(conversation_id)
+        while len(self._windows) > self.max_conversations:
+            self._windows.popitem(last=False)
+        return window
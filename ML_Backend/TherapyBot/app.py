@@ -1,10 +1,15 @@
 from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
+import sys
 import json
+import atexit
+import signal
 import threading
 
 # from chatbot_stream import Chatbot
-from agent_stream import TherapyAgent
+from service import get_chatbot, prepare_database, stream_chat, watch_external_changes
+from TherapyBot.metrics import METRICS_CONTENT_TYPE, render_metrics
+from TherapyBot.persistence import get_writer
 import os
 import asyncio
 from queue import Queue
@@ -31,61 +36,35 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-# ---------------------------------------------------------------------------
-# DB persistence helper (runs in a background thread after streaming ends)
-# ---------------------------------------------------------------------------
-
-def _save_conversation_to_db(
-    user_id: str,
-    conversation_id: str,
-    user_message: str,
-    bot_response: str,
-    metadata: dict,
-):
-    """Persist user + companion messages after a chat turn completes."""
-    try:
-        from db_client import ensure_conversation, save_message
-
-        ensure_conversation(user_id, conversation_id, user_message)
-
-        # User message (no metadata)
-        save_message(conversation_id, "user", user_message)
-
-        # Companion message with captured metadata
-        emotions     = metadata.get("emotions", [])
-        strategies   = metadata.get("strategies", [])
-        tool_events  = metadata.get("tool_events", [])
-        rag_sources  = metadata.get("rag_sources", [])
-        # Store as { toolName: {name, args, result} } for easy lookup in frontend
-        tool_calls_obj = (
-            {ev.get("name"): ev for ev in tool_events if ev.get("name")}
-            if tool_events
-            else {}
-        )
-        save_message(
-            conversation_id,
-            "companion",
-            bot_response,
-            emotion=emotions,
-            strategy_used=strategies,
-            tool_calls=tool_calls_obj,
-            rag_sources=rag_sources,
-        )
-        logger.info("[DB] Saved turn for user=%s conversation=%s", user_id, conversation_id)
-    except Exception as exc:
-        logger.error("[DB] Failed to save conversation turn: %s", exc)
-
 # Create a single instance of Chatbot
-chatbot = TherapyAgent(task_debug=True, agent_debug=False)
-
-# Create a single event loop for async operations
-loop = asyncio.new_event_loop()
-asyncio.set_event_loop(loop)
+chatbot = get_chatbot()
+prepare_database()
+
+# A single event loop per process for async operations. It is started on first
+# use rather than at import, because under a pre-forking server (gunicorn) the
+# loop thread does not survive the fork and each worker needs its own.
+loop = None
+_loop_pid = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+
+def get_loop():
+    """Return this process's event loop, starting its thread if needed"""
+    global loop, _loop_pid, _loop_thread
+    with _loop_lock:
+        if loop is None or _loop_pid != os.getpid():
+            loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _loop_thread = threading.Thread(target=run_event_loop, daemon=True)
+            _loop_thread.start()
+            asyncio.run_coroutine_threadsafe(watch_external_changes(), loop)
+    return loop
 
 
 def run_in_loop(coroutine):
     """Run a coroutine in the main event loop"""
-    future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+    future = asyncio.run_coroutine_threadsafe(coroutine, get_loop())
     try:
         return future.result()
     except Exception as e:
@@ -93,61 +72,30 @@ def run_in_loop(coroutine):
         raise
 
 
-async def process_chat_async(message, conversation_id, user_id, queue, metadata_holder):
-    """Process chat messages asynchronously"""
+async def process_chat_async(message, conversation_id, user_id, queue):
+    """Process chat messages asynchronously, forwarding SSE frames to the queue"""
     try:
-        async for chunk in chatbot.chat(message, conversation_id, user_id):
-            await asyncio.sleep(0)  # Give other tasks a chance to run
-            if isinstance(chunk, dict) and "__metadata__" in chunk:
-                metadata_holder.update(chunk["__metadata__"])
-            else:
-                queue.put(chunk)
-    except Exception as e:
-        logger.error(f"Error in chat processing: {e}", exc_info=True)
-        queue.put({"error": str(e)})
+        async for frame in stream_chat(message, conversation_id, user_id):
+            queue.put(frame)
     finally:
         queue.put(None)  # Signal completion
 
 
 def generate_response(message, conversation_id, user_id):
     queue = Queue()
-    metadata_holder: dict = {}
-    full_response: list = []
 
     # Start process_chat_async in a separate thread to fill the queue concurrently.
     threading.Thread(
         target=run_in_loop,
-        args=(process_chat_async(message, conversation_id, user_id, queue, metadata_holder),),
+        args=(process_chat_async(message, conversation_id, user_id, queue),),
         daemon=True,
     ).start()
 
     while True:
-        chunk = queue.get()
-        if chunk is None:  # Completion signal
-            break
-        if isinstance(chunk, dict) and "error" in chunk:
-            yield f"data: {json.dumps({'error': chunk['error']})}\n\n"
+        frame = queue.get()
+        if frame is None:  # Completion signal
             break
-        full_response.append(chunk)
-        yield f"data: {json.dumps({'content': chunk})}\n\n"
-
-    # Forward tool events to the client as a special SSE frame
-    tool_events = metadata_holder.get("tool_events", [])
-    if tool_events:
-        yield f"data: {json.dumps({'toolEvents': tool_events})}\n\n"
-
-    # Persist the full turn to MongoDB in a background thread
-    threading.Thread(
-        target=_save_conversation_to_db,
-        args=(
-            user_id,
-            conversation_id,
-            message,
-            "".join(full_response),
-            metadata_holder,
-        ),
-        daemon=True,
-    ).start()
+        yield frame
 
 
 @app.route("/")
@@ -160,6 +108,7 @@ def home():
         "endpoints": {
             "/": "API information",
             "/health": "Health check endpoint",
+            "/metrics": "Per-stage latency histograms (Prometheus text format)",
             "/chat": "Chat endpoint (POST) - accepts message, sessionId, userId"
         }
     })
@@ -171,6 +120,12 @@ def health():
     return jsonify({"status": "healthy", "service": "TherapyBot API"}), 200
 
 
+@app.route("/metrics")
+def metrics():
+    """Per-stage latency histograms in the Prometheus text format"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
 @app.route("/chat", methods=["POST"])
 def chat():
     """
@@ -214,10 +169,22 @@ def run_event_loop():
     loop.run_forever()
 
 
+@atexit.register
+def flush_writer():
+    """
+    Write the turns still queued for MongoDB before the process exits. The
+    __main__ block does this before stopping the loop; this is the fallback
+    for processes that exit without going through it.
+    """
+    if loop is not None and _loop_pid == os.getpid() and loop.is_running():
+        asyncio.run_coroutine_threadsafe(get_writer().close(), loop).result(timeout=30)
+
+
 if __name__ == "__main__":
     # Start the event loop in a separate thread
-    thread = threading.Thread(target=run_event_loop, daemon=True)
-    thread.start()
+    get_loop()
+    # Let SIGTERM unwind like Ctrl-C, so the finally block below flushes the writer
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
     try:
         port = int(os.environ.get("PORT", 5000))
@@ -226,7 +193,12 @@ if __name__ == "__main__":
             host="0.0.0.0", port=port, debug=True, use_reloader=False, threaded=True
         )
     finally:
-        # Clean up when the application exits
+        # Clean up when the application exits: drain the writer while the loop
+        # still runs (atexit would only find it stopped)
+        try:
+            asyncio.run_coroutine_threadsafe(get_writer().close(), loop).result(timeout=30)
+        except Exception as e:
+            logger.error(f"Could not flush queued turns: {e}")
         loop.call_soon_threadsafe(loop.stop)
-        thread.join()
+        _loop_thread.join()
         loop.close()
@@ -0,0 +1,121 @@
+"""
+ASGI entry point for the TherapyBot API.
+
+Serves the same endpoints and /chat contract as app.py, but streams SSE frames
+straight from TherapyAgent.chat's async generator on the server's own event
+loop, so each open stream costs a coroutine instead of a thread plus a queue.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from service import get_chatbot, prepare_database, stream_chat, watch_external_changes
+from TherapyBot.metrics import METRICS_CONTENT_TYPE, render_metrics
+from TherapyBot.persistence import get_writer
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the agent and its models before accepting requests
+    get_chatbot()
+    await asyncio.to_thread(prepare_database)
+    watcher = asyncio.create_task(watch_external_changes())
+    yield
+    watcher.cancel()
+    # Write the turns still queued for MongoDB
+    await get_writer().close()
+
+
+app = FastAPI(title="TherapyBot API", version="1.0.0", lifespan=lifespan)
+
+# Enable CORS for all routes to allow external frontend clients
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Configure specific origins in production
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],  # Ready for Bearer tokens
+    expose_headers=["Content-Type"],
+    allow_credentials=True,
+)
+
+
+@app.get("/")
+async def home():
+    """API root endpoint - returns basic API information"""
+    return {
+        "name": "TherapyBot API",
+        "version": "1.0.0",
+        "status": "running",
+        "endpoints": {
+            "/": "API information",
+            "/health": "Health check endpoint",
+            "/metrics": "Per-stage latency histograms (Prometheus text format)",
+            "/chat": "Chat endpoint (POST) - accepts message, sessionId, userId",
+        },
+    }
+
+
+@app.get("/health")
+async def health():
+    """Health check endpoint for monitoring"""
+    return {"status": "healthy", "service": "TherapyBot API"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage latency histograms in the Prometheus text format"""
+    return Response(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.post("/chat")
+async def chat(request: Request):
+    """
+    Chat endpoint - streams responses via Server-Sent Events
+
+    Expects JSON body:
+    {
+        "message": str,
+        "conversationId": str,   -- MongoDB _id of the conversation
+        "userId": str|int
+    }
+
+    Returns: text/event-stream with JSON chunks
+    """
+    try:
+        data = await request.json()
+    except Exception:
+        return JSONResponse({"error": "Request body must be valid JSON"}, status_code=400)
+
+    message = data.get("message")
+    conversation_id = data.get("conversationId")
+    user_id = data.get("userId")
+
+    if not message or not conversation_id:
+        return JSONResponse(
+            {"error": "Missing required fields: message and conversationId"},
+            status_code=400,
+        )
+
+    return StreamingResponse(
+        stream_chat(message, conversation_id, user_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Connection": "keep-alive",
+        },
+    )
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Compare prompt tokens over a scripted 30-turn conversation when the per-turn
+context (book excerpts, emotions, strategy) is stored in the history versus
+injected only into the current turn.
+
+No LLM calls are made: replies are fixed placeholder text so only the prompt
+assembly differs between the two runs. Pass --live-rag to use real excerpts
+from the books Chroma DB instead of same-sized placeholder excerpts.
+
+Usage:
+    python bench_history_tokens.py [--live-rag]
+"""
+
+import os
+import sys
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from TherapyBot.utils import system_prompt, turn_context_prompt
+
+SCRIPT = [
+    "Hi, I haven't been sleeping well lately.",
+    "I keep thinking about work when I lie down.",
+    "My manager moved my deadline up by two weeks.",
+    "I feel like I can't say no to anything.",
+    "Yes, it has been like this for about a month.",
+    "I used to go running but I stopped.",
+    "I don't really have the energy anymore.",
+    "My partner says I seem distant.",
+    "I guess I am distant. I'm always tired.",
+    "I tried meditating once but my mind wandered.",
+    "Maybe I could try a shorter one.",
+    "What if I can't keep it up?",
+    "I think I'm scared of failing at work.",
+    "My dad always said mistakes were unacceptable.",
+    "Yeah, I never thought about it that way.",
+    "I had a panic attack in a meeting last week.",
+    "Nobody noticed, I think. I left early.",
+    "I felt embarrassed afterwards.",
+    "I haven't told anyone about it.",
+    "Maybe I could tell my partner.",
+    "I'm worried she'll think I'm weak.",
+    "That makes sense. She has been supportive before.",
+    "I could also talk to my manager about the deadline.",
+    "I'm not sure how to bring it up.",
+    "Could you help me plan what to say?",
+    "That sounds doable. I'll try tomorrow.",
+    "I also want to start running again.",
+    "Maybe twice a week to begin with.",
+    "Thank you, I feel a bit lighter now.",
+    "I'll let you know how the conversation goes.",
+]
+
+PLACEHOLDER_REPLY = (
+    "It sounds like a lot has been weighing on you, and it makes sense that it is "
+    "showing up at night when things finally get quiet. You've noticed a connection "
+    "between the pressure at work and how you feel, which is an important first step. "
+    "Would it help to look at one small thing you could change this week, so that the "
+    "evenings feel a little more like yours again?"
+)
+PLACEHOLDER_EXCERPT = (
+    "When we are under sustained pressure, the body's stress response stays switched on "
+    "long after the stressful event has passed. " * 8
+).strip()
+
+
+def _excerpts(query: str, live_rag: bool) -> str:
+    if live_rag:
+        from RAG.retreive_books import query_retriever
+        return query_retriever(query)[0]
+    # query_retriever returns k=3 chunks of up to ~1000 characters each
+    return "\n\n".join(PLACEHOLDER_EXCERPT for _ in range(3))
+
+
+def run(live_rag: bool = False):
+    system = SystemMessage(content=system_prompt.template)
+    stored_history = []  # old behaviour: wrapped message is checkpointed
+    clean_history = []  # new behaviour: only the user's words are checkpointed
+    totals = {"stored": 0, "clean": 0}
+
+    print(f"{'turn':>4} | {'context in history':>18} | {'current turn only':>17} | saved")
+    print("-" * 58)
+    for turn, query in enumerate(SCRIPT, start=1):
+        message_text = turn_context_prompt.format(
+            input=query,
+            context=_excerpts(query, live_rag),
+            memories="- The user works in an office job with frequent deadlines.",
+            emotion_result=["nervousness", "sadness"],
+            reasoning_for_strategy=(
+                "The user is opening up about stress, so reflecting their feelings "
+                "before suggesting anything keeps the pace gentle."
+            ),
+            strategy_result=["Reflection of feelings", "Question"],
+        )
+        wrapped = HumanMessage(content=message_text)
+
+        stored_prompt = count_tokens_approximately([system, *stored_history, wrapped])
+        clean_prompt = count_tokens_approximately([system, *clean_history, wrapped])
+        totals["stored"] += stored_prompt
+        totals["clean"] += clean_prompt
+
+        stored_history += [wrapped, AIMessage(content=PLACEHOLDER_REPLY)]
+        clean_history += [HumanMessage(content=query), AIMessage(content=PLACEHOLDER_REPLY)]
+
+        if turn % 5 == 0 or turn == 1:
+            saved = 1 - clean_prompt / stored_prompt
+            print(f"{turn:>4} | {stored_prompt:>18} | {clean_prompt:>17} | {saved:6.1%}")
+
+    print("-" * 58)
+    saved = 1 - totals["clean"] / totals["stored"]
+    print(
+        f"total prompt tokens over {len(SCRIPT)} turns: "
+        f"{totals['stored']} -> {totals['clean']} ({saved:.1%} fewer)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare prompt tokens with and without per-turn context in history"
+    )
+    parser.add_argument(
+        "--live-rag",
+        action="store_true",
+        help="Use real excerpts from the books Chroma DB",
+    )
+    args = parser.parse_args()
+    run(live_rag=args.live_rag)
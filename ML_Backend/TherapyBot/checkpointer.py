@@ -0,0 +1,532 @@
+"""
+Persistent, memory-bounded checkpointer for the TherapyAgent.
+
+Only the latest checkpoint (plus its pending writes) is kept per conversation
+thread, which is all the agent needs to continue a conversation. Checkpoints are
+written through to a shared backend (local SQLite file or MongoDB) so they
+survive restarts and can be read by other worker processes, while a small LRU
+of recently active threads is kept in RAM in serialized form.
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_THREADS = 1000
+DEFAULT_MAX_THREAD_BYTES = 256 * 1024
+DEFAULT_IDLE_TTL_S = 30 * 60
+
+
+# ---------------------------------------------------------------------------
+# Storage backends
+# ---------------------------------------------------------------------------
+
+class CheckpointStore:
+    """Key/value storage for one serialized checkpoint record per thread."""
+
+    def load(self, thread_id: str, checkpoint_ns: str) -> Optional[Tuple[str, bytes]]:
+        raise NotImplementedError
+
+    def checkpoint_id(self, thread_id: str, checkpoint_ns: str) -> Optional[str]:
+        """Return only the id of the stored checkpoint (cheap freshness check)."""
+        raise NotImplementedError
+
+    def save(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        checkpoint_id: str,
+        payload: Tuple[str, bytes],
+    ) -> None:
+        raise NotImplementedError
+
+    def delete(self, thread_id: str) -> None:
+        raise NotImplementedError
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Local SQLite file; WAL mode lets several worker processes on one host share it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id     TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL,
+                    checkpoint_id TEXT NOT NULL,
+                    type          TEXT NOT NULL,
+                    payload       BLOB NOT NULL,
+                    updated_at    REAL NOT NULL,
+                    PRIMARY KEY (thread_id, checkpoint_ns)
+                )"""
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, thread_id, checkpoint_ns):
+        row = self._conn().execute(
+            "SELECT type, payload FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ).fetchone()
+        return (row[0], bytes(row[1])) if row else None
+
+    def checkpoint_id(self, thread_id, checkpoint_ns):
+        row = self._conn().execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, thread_id, checkpoint_ns, checkpoint_id, payload):
+        with self._conn() as conn:
+            conn.execute(
+                """INSERT INTO checkpoints
+                       (thread_id, checkpoint_ns, checkpoint_id, type, payload, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (thread_id, checkpoint_ns) DO UPDATE SET
+                       checkpoint_id = excluded.checkpoint_id,
+                       type          = excluded.type,
+                       payload       = excluded.payload,
+                       updated_at    = excluded.updated_at""",
+                (thread_id, checkpoint_ns, checkpoint_id, payload[0], payload[1], time.time()),
+            )
+
+    def delete(self, thread_id):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+
+
+class MongoCheckpointStore(CheckpointStore):
+    """Stores checkpoints in the `agent_checkpoints` collection of the app database."""
+
+    def __init__(self, collection_name: str = "agent_checkpoints"):
+        self.collection_name = collection_name
+
+    @property
+    def _collection(self):
+        from db_client import get_db
+        return get_db()[self.collection_name]
+
+    @staticmethod
+    def _key(thread_id: str, checkpoint_ns: str) -> str:
+        return f"{thread_id}:{checkpoint_ns}"
+
+    def load(self, thread_id, checkpoint_ns):
+        doc = self._collection.find_one(
+            {"_id": self._key(thread_id, checkpoint_ns)}, {"type": 1, "payload": 1}
+        )
+        return (doc["type"], bytes(doc["payload"])) if doc else None
+
+    def checkpoint_id(self, thread_id, checkpoint_ns):
+        doc = self._collection.find_one(
+            {"_id": self._key(thread_id, checkpoint_ns)}, {"checkpointId": 1}
+        )
+        return doc["checkpointId"] if doc else None
+
+    def save(self, thread_id, checkpoint_ns, checkpoint_id, payload):
+        self._collection.replace_one(
+            {"_id": self._key(thread_id, checkpoint_ns)},
+            {
+                "threadId": thread_id,
+                "checkpointNs": checkpoint_ns,
+                "checkpointId": checkpoint_id,
+                "type": payload[0],
+                "payload": payload[1],
+                "updatedAt": datetime.now(timezone.utc),
+            },
+            upsert=True,
+        )
+
+    def delete(self, thread_id):
+        self._collection.delete_many({"threadId": thread_id})
+
+
+# ---------------------------------------------------------------------------
+# Checkpointer
+# ---------------------------------------------------------------------------
+
+class _Entry:
+    """Serialized latest checkpoint of one thread, as held in the RAM cache."""
+
+    __slots__ = ("checkpoint_id", "parent_id", "checkpoint", "metadata", "writes", "last_used")
+
+    def __init__(self, checkpoint_id, parent_id, checkpoint, metadata, writes=None):
+        self.checkpoint_id: str = checkpoint_id
+        self.parent_id: Optional[str] = parent_id
+        self.checkpoint: Tuple[str, bytes] = checkpoint
+        self.metadata: Tuple[str, bytes] = metadata
+        # (task_id, idx) -> (task_id, channel, (type, bytes), task_path)
+        self.writes: Dict[Tuple[str, int], Tuple[str, str, Tuple[str, bytes], str]] = writes or {}
+        self.last_used = time.monotonic()
+
+
+class BoundedCheckpointSaver(BaseCheckpointSaver):
+    """
+    Latest-checkpoint-only saver with a write-through backend and an LRU RAM cache.
+
+    - `max_threads` / `idle_ttl_s` bound how many threads stay cached in RAM;
+      evicted threads are reloaded from the backend on their next access.
+    - `max_thread_bytes` bounds each thread's serialized checkpoint: the oldest
+      exchanges of the `messages` channel are dropped until it fits (leading
+      system summaries are kept).
+    - With `shared=True` a cached thread is revalidated against the backend's
+      checkpoint id before use, so several workers can serve the same thread.
+    """
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_thread_bytes: int = DEFAULT_MAX_THREAD_BYTES,
+        idle_ttl_s: float = DEFAULT_IDLE_TTL_S,
+        shared: bool = True,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.store = store
+        self.max_threads = max_threads
+        self.max_thread_bytes = max_thread_bytes
+        self.idle_ttl_s = idle_ttl_s
+        self.shared = shared
+        self._cache: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    # ----------------------------- cache --------------------------------
+
+    def _evict(self):
+        """Drop idle threads and trim the cache to `max_threads` (caller holds the lock)."""
+        now = time.monotonic()
+        while self._cache:
+            entry = next(iter(self._cache.values()))
+            if len(self._cache) > self.max_threads or now - entry.last_used > self.idle_ttl_s:
+                self._cache.popitem(last=False)
+            else:
+                break
+
+    def _cache_put(self, key: Tuple[str, str], entry: _Entry):
+        with self._lock:
+            entry.last_used = time.monotonic()
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            self._evict()
+
+    def _get_entry(
+        self, thread_id: str, checkpoint_ns: str, validate: bool = True
+    ) -> Optional[_Entry]:
+        key = (thread_id, checkpoint_ns)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                entry.last_used = time.monotonic()
+
+        if entry is not None and (
+            not (self.shared and validate)
+            or self.store.checkpoint_id(thread_id, checkpoint_ns) == entry.checkpoint_id
+        ):
+            return entry
+
+        payload = self.store.load(thread_id, checkpoint_ns)
+        if payload is None:
+            with self._lock:
+                self._cache.pop(key, None)
+            return None
+        entry = self._decode_entry(payload)
+        self._cache_put(key, entry)
+        return entry
+
+    def _save_entry(self, thread_id: str, checkpoint_ns: str, entry: _Entry):
+        self._cache_put((thread_id, checkpoint_ns), entry)
+        self.store.save(thread_id, checkpoint_ns, entry.checkpoint_id, self._encode_entry(entry))
+
+    # ------------------------- serialization ----------------------------
+
+    def _encode_entry(self, entry: _Entry) -> Tuple[str, bytes]:
+        return self.serde.dumps_typed(
+            {
+                "checkpoint_id": entry.checkpoint_id,
+                "parent_id": entry.parent_id,
+                "checkpoint": list(entry.checkpoint),
+                "metadata": list(entry.metadata),
+                "writes": [
+                    [task_id, idx, channel, value[0], value[1], task_path]
+                    for (task_id, idx), (_, channel, value, task_path) in entry.writes.items()
+                ],
+            }
+        )
+
+    def _decode_entry(self, payload: Tuple[str, bytes]) -> _Entry:
+        record = self.serde.loads_typed(payload)
+        writes = {
+            (task_id, idx): (task_id, channel, (value_type, value), task_path)
+            for task_id, idx, channel, value_type, value, task_path in record["writes"]
+        }
+        return _Entry(
+            record["checkpoint_id"],
+            record["parent_id"],
+            tuple(record["checkpoint"]),
+            tuple(record["metadata"]),
+            writes,
+        )
+
+    def _dump_checkpoint(self, checkpoint: Checkpoint) -> Tuple[str, bytes]:
+        """Serialize a checkpoint, dropping the oldest messages if it exceeds the byte budget."""
+        payload = self.serde.dumps_typed(checkpoint)
+        values = checkpoint.get("channel_values") or {}
+        messages = values.get("messages")
+        if len(payload[1]) <= self.max_thread_bytes or not messages:
+            return payload
+
+        lead = 0
+        while lead < len(messages) and getattr(messages[lead], "type", None) == "system":
+            lead += 1
+        head, body = list(messages[:lead]), list(messages[lead:])
+
+        while len(payload[1]) > self.max_thread_bytes:
+            # cut at the next user message so tool calls and their results stay paired
+            cut = next(
+                (i for i in range(1, len(body)) if getattr(body[i], "type", None) == "human"),
+                None,
+            )
+            if cut is None:
+                logger.warning(
+                    "[CHECKPOINT] Thread state is %d bytes, over the %d byte budget",
+                    len(payload[1]),
+                    self.max_thread_bytes,
+                )
+                break
+            body = body[cut:]
+            checkpoint = {
+                **checkpoint,
+                "channel_values": {**values, "messages": head + body},
+            }
+            payload = self.serde.dumps_typed(checkpoint)
+        return payload
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, entry: _Entry) -> CheckpointTuple:
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": entry.checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed(entry.checkpoint),
+            metadata=self.serde.loads_typed(entry.metadata),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": entry.parent_id,
+                    }
+                }
+                if entry.parent_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value, _ in entry.writes.values()
+            ],
+        )
+
+    # ----------------------- BaseCheckpointSaver ------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entry = self._get_entry(thread_id, checkpoint_ns)
+        if entry is None:
+            return None
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != entry.checkpoint_id:
+            # only the latest checkpoint of each thread is retained
+            return None
+        return self._to_tuple(thread_id, checkpoint_ns, entry)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config is None or limit == 0:
+            return
+        checkpoint_tuple = self.get_tuple(config)
+        if checkpoint_tuple is None:
+            return
+        if before and get_checkpoint_id(before) and (
+            checkpoint_tuple.checkpoint["id"] >= get_checkpoint_id(before)
+        ):
+            return
+        if filter and not all(
+            checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()
+        ):
+            return
+        yield checkpoint_tuple
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        entry = _Entry(
+            checkpoint_id=checkpoint["id"],
+            parent_id=config["configurable"].get("checkpoint_id"),
+            checkpoint=self._dump_checkpoint(checkpoint),
+            metadata=self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+        )
+        self._save_entry(thread_id, checkpoint_ns, entry)
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # the checkpoint was just put by this process, no need to revalidate it
+        entry = self._get_entry(thread_id, checkpoint_ns, validate=False)
+        if entry is None:
+            return
+        values = [
+            ((task_id, WRITES_IDX_MAP.get(channel, idx)), channel, self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        # Copy on write under the lock: other threads may be reading the cached
+        # entry's writes (_to_tuple), and parallel tasks add theirs concurrently
+        with self._lock:
+            # the latest cached version, unless it was evicted in the meantime
+            entry = self._cache.get((thread_id, checkpoint_ns), entry)
+            if entry.checkpoint_id != checkpoint_id:
+                return
+            pending = dict(entry.writes)
+            for key, channel, value in values:
+                if key[1] >= 0 and key in pending:
+                    continue
+                pending[key] = (task_id, channel, value, task_path)
+            entry = _Entry(entry.checkpoint_id, entry.parent_id, entry.checkpoint, entry.metadata, pending)
+            self._save_entry(thread_id, checkpoint_ns, entry)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._cache if k[0] == thread_id]:
+                del self._cache[key]
+        self.store.delete(thread_id)
+
+    # Backends are synchronous; keep their I/O off the event loop.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def build_checkpointer(backend: Optional[str] = None) -> BaseCheckpointSaver:
+    """
+    Create the conversation checkpointer selected by CHECKPOINT_BACKEND
+    ("sqlite" (default), "mongo" or "memory").
+    """
+    backend = (backend or os.getenv("CHECKPOINT_BACKEND", "sqlite")).lower()
+    if backend == "memory":
+        return InMemorySaver()
+
+    if backend == "sqlite":
+        store = SQLiteCheckpointStore(
+            os.getenv(
+                "CHECKPOINT_SQLITE_PATH",
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_checkpoints.db"),
+            )
+        )
+    elif backend == "mongo":
+        store = MongoCheckpointStore()
+    else:
+        raise ValueError(f"Unknown CHECKPOINT_BACKEND '{backend}'")
+
+    return BoundedCheckpointSaver(
+        store,
+        max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", DEFAULT_MAX_THREADS)),
+        max_thread_bytes=int(os.getenv("CHECKPOINT_MAX_THREAD_BYTES", DEFAULT_MAX_THREAD_BYTES)),
+        idle_ttl_s=float(os.getenv("CHECKPOINT_IDLE_TTL_S", DEFAULT_IDLE_TTL_S)),
+    )
@@ -0,0 +1,118 @@
+"""
+Background compaction of long conversation threads.
+
+After a turn has been streamed, the thread's size is checked and, once it passes
+a token threshold, the older messages are summarised into a single system
+message and written back to the checkpointer. The summarisation LLM call never
+runs inside a user's turn.
+"""
+
+import asyncio
+import logging
+from typing import List, Set
+
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    SystemMessage,
+)
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
+
+logger = logging.getLogger(__name__)
+
+
+def _render_transcript(messages: List[BaseMessage]) -> str:
+    """Plain-text transcript of the messages being summarised."""
+    lines = []
+    for msg in messages:
+        content = msg.content if isinstance(msg.content, str) else str(msg.content)
+        if not content.strip():
+            continue  # e.g. AI messages that only carry tool calls
+        if msg.type == "system":
+            lines.append(f"Summary of earlier conversation: {content}")
+        elif msg.type == "human":
+            lines.append(f"User: {content}")
+        elif msg.type == "ai":
+            lines.append(f"Assistant: {content}")
+        elif msg.type == "tool":
+            lines.append(f"Tool result ({getattr(msg, 'name', 'tool')}): {content}")
+    return "\n".join(lines)
+
+
+class ConversationCompactor:
+    """Summarises threads that grew past `token_threshold`, off the critical path."""
+
+    def __init__(
+        self,
+        agent,
+        summary_llm,
+        summary_prompt: str,
+        token_threshold: int = 4000,
+        messages_to_keep: int = 6,
+    ):
+        self.agent = agent
+        self.summary_llm = summary_llm
+        self.summary_prompt = summary_prompt
+        self.token_threshold = token_threshold
+        self.messages_to_keep = messages_to_keep
+        self._tasks: Set[asyncio.Task] = set()
+        self._compacting: Set[str] = set()
+
+    def schedule(self, config: RunnableConfig):
+        """Check the thread in the background once the current turn has finished."""
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._compacting:
+            return
+        self._compacting.add(thread_id)
+        task = asyncio.create_task(self._compact(config))
+        self._tasks.add(task)
+
+        def _done(t: asyncio.Task):
+            self._tasks.discard(t)
+            self._compacting.discard(thread_id)
+
+        task.add_done_callback(_done)
+
+    async def _compact(self, config: RunnableConfig):
+        thread_id = config["configurable"]["thread_id"]
+        try:
+            snapshot = await self.agent.aget_state(config)
+            messages: List[BaseMessage] = snapshot.values.get("messages", [])
+            if count_tokens_approximately(messages) < self.token_threshold:
+                return
+
+            # Keep the most recent messages, starting the kept part on a user message
+            # so tool calls and their results are never split.
+            split = len(messages) - self.messages_to_keep
+            while split > 0 and not isinstance(messages[split], HumanMessage):
+                split -= 1
+            if split <= 0:
+                return
+            old = messages[:split]
+
+            summary = await self.summary_llm.ainvoke(
+                [
+                    SystemMessage(content=self.summary_prompt),
+                    HumanMessage(content=_render_transcript(old)),
+                ]
+            )
+
+            # The summary takes the id of the first summarised message, so add_messages
+            # replaces it in place; the rest are removed by id. Messages appended by a
+            # turn that ran meanwhile are left untouched.
+            await self.agent.aupdate_state(
+                config,
+                {
+                    "messages": [
+                        SystemMessage(content=summary.content, id=old[0].id),
+                        *[RemoveMessage(id=m.id) for m in old[1:]],
+                    ]
+                },
+            )
+            logger.info(
+                "[COMPACT] Summarised %d messages of thread %s", len(old), thread_id
+            )
+        except Exception as exc:
+            logger.error("[COMPACT] Compaction failed for thread %s: %s", thread_id, exc)
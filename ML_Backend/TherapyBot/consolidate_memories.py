@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Deduplicate near-duplicate user memories by deletion.
+
+The agent saves memories freely, so the same fact piles up in different words
+("user is a student", "user studies at university"). For each user this groups
+memories of the same type whose embeddings are within --threshold cosine
+similarity of a group's canonical memory, keeps the canonical one (the longest,
+i.e. most specific, wording) and deletes the rest. Nothing is rewritten: detail
+that only a shorter duplicate carries is lost, so keep the threshold high and
+check a --dry-run first.
+
+Memories without an embedding are embedded first; for "info" memories the
+vector is stored so the chat server does not have to do it later (not with
+--dry-run, which changes nothing). Running servers pick up the smaller memory
+sets when their per-user index expires (MEMORY_INDEX_TTL_S).
+
+Usage:
+    python consolidate_memories.py [--user USER_ID] [--threshold 0.8] [--dry-run]
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np
+
+from db_client import get_db, get_user_memories, set_memory_embeddings
+
+
+def _embed_missing(memories: list, store: bool = True):
+    """Fill in missing embeddings in place; with `store`, save the new "info" vectors."""
+    missing = [m for m in memories if not m["embedding"]]
+    if not missing:
+        return
+    from RAG.embedding_service import get_embeddings
+
+    vectors = get_embeddings().embed_documents([m["content"] for m in missing])
+    for memory, vector in zip(missing, vectors):
+        memory["embedding"] = vector
+    if not store:
+        return
+    # "instruct" memories are kept unembedded, matching the Memory schema
+    set_memory_embeddings(
+        [(m["id"], m["embedding"]) for m in missing if m["memory_type"] == "info"]
+    )
+
+
+def group_duplicates(memories: list, threshold: float) -> list:
+    """
+    Leader clustering within each memory type: memories are visited longest
+    first and join the group whose canonical (first) memory is most similar,
+    if that similarity is at least `threshold`, else start a new group.
+    Comparing against the canonical memory only keeps chains of loosely
+    related memories from collapsing into one group.
+    """
+    groups = []
+    by_type = {}
+    for memory in memories:
+        by_type.setdefault(memory["memory_type"], []).append(memory)
+
+    for same_type in by_type.values():
+        same_type.sort(key=lambda m: len(m["content"]), reverse=True)
+        matrix = np.asarray([m["embedding"] for m in same_type], dtype=np.float32)
+        matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+        leaders = []  # row index of each group's canonical memory
+        type_groups = []
+        for i, memory in enumerate(same_type):
+            if leaders:
+                scores = matrix[leaders] @ matrix[i]
+                best = int(np.argmax(scores))
+                if scores[best] >= threshold:
+                    type_groups[best].append(memory)
+                    continue
+            leaders.append(i)
+            type_groups.append([memory])
+        groups.extend(type_groups)
+    return groups
+
+
+def consolidate_user(user_id: str, threshold: float, dry_run: bool = False) -> int:
+    """Deduplicate one user's memories. Returns the number of memories removed."""
+    memories = get_user_memories(user_id, limit=10_000)
+    if len(memories) < 2:
+        return 0
+    _embed_missing(memories, store=not dry_run)
+
+    duplicates = []
+    for group in group_duplicates(memories, threshold):
+        if len(group) < 2:
+            continue
+        canonical, rest = group[0], group[1:]
+        print(f"[{user_id}] keep: {canonical['content']!r}")
+        for memory in rest:
+            print(f"[{user_id}]   delete duplicate: {memory['content']!r}")
+        duplicates.extend(m["id"] for m in rest)
+
+    if duplicates and not dry_run:
+        from bson import ObjectId
+
+        get_db().memories.delete_many({"_id": {"$in": [ObjectId(i) for i in duplicates]}})
+    return len(duplicates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete near-duplicate user memories")
+    parser.add_argument("--user", help="Only consolidate this user's memories")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("MEMORY_MERGE_THRESHOLD", "0.8")),
+        help="Cosine similarity at which two memories count as the same fact",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Print the deletions without changing anything"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    user_ids = [args.user] if args.user else get_db().memories.distinct("userId")
+    removed = 0
+    for user_id in user_ids:
+        removed += consolidate_user(user_id, args.threshold, dry_run=args.dry_run)
+
+    verb = "would remove" if args.dry_run else "removed"
+    print(f"\n{len(user_ids)} users, {verb} {removed} duplicate memories")
+
+
+if __name__ == "__main__":
+    main()
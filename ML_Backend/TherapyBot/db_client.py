@@ -5,12 +5,16 @@ without going through the Node backend API.
 """
 
 import os
+import time
+import asyncio
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime, timezone
 from typing import Optional
 
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, PyMongoError
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, MongoClient, UpdateOne
+from pymongo.errors import ConnectionFailure, OperationFailure, PyMongoError
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,30 +23,57 @@ logger = logging.getLogger(__name__)
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/therapy_app")
 
+# Connection pool settings, applied to both the sync and the async client
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+
 _client: Optional[MongoClient] = None
 
 
+def _client_options() -> dict:
+    return {
+        "serverSelectionTimeoutMS": 3000,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    }
+
+
+def _db_name() -> str:
+    # Extract DB name from the URI  (last path segment, strip query string)
+    return MONGO_URI.rstrip("/").split("/")[-1].split("?")[0] or "therapy_app"
+
+
 def get_db():
     """Return the MongoDB database, creating the client once."""
     global _client
     if _client is None:
         try:
-            _client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=3000)
+            _client = MongoClient(MONGO_URI, **_client_options())
             _client.admin.command("ping")
             logger.info("[DB] Connected to MongoDB at %s", MONGO_URI)
         except ConnectionFailure as exc:
             logger.error("[DB] Could not connect to MongoDB: %s", exc)
             raise
 
-    # Extract DB name from the URI  (last path segment, strip query string)
-    db_name = MONGO_URI.rstrip("/").split("/")[-1].split("?")[0] or "therapy_app"
-    return _client[db_name]
+    return _client[_db_name()]
 
 
 # ---------------------------------------------------------------------------
 # Conversations
 # ---------------------------------------------------------------------------
 
+def _conversation_oid(conversation_id: str):
+    """The conversation's ObjectId, or None (logged) if the id is malformed."""
+    from bson import ObjectId
+    try:
+        return ObjectId(conversation_id)
+    except Exception:
+        logger.error("[DB] Invalid conversation_id '%s'", conversation_id)
+        return None
+
+
 def ensure_conversation(user_id: str, conversation_id: str, first_message: str = "") -> str:
     """
     Update lastMessageAt / title on an existing Conversation document.
@@ -52,7 +83,6 @@ def ensure_conversation(user_id: str, conversation_id: str, first_message: str =
     """
     try:
         db = get_db()
-        from bson import ObjectId
         now = datetime.now(timezone.utc)
 
         max_title_len = 50
@@ -62,10 +92,8 @@ def ensure_conversation(user_id: str, conversation_id: str, first_message: str =
             else first_message or "New Conversation"
         )
 
-        try:
-            oid = ObjectId(conversation_id)
-        except Exception:
-            logger.error("[DB] Invalid conversation_id '%s'", conversation_id)
+        oid = _conversation_oid(conversation_id)
+        if oid is None:
             return conversation_id
 
         db.conversations.update_one(
@@ -87,6 +115,31 @@ def ensure_conversation(user_id: str, conversation_id: str, first_message: str =
 # Messages
 # ---------------------------------------------------------------------------
 
+def _message_doc(
+    conversation_id: str,
+    role: str,
+    content: str,
+    emotion: list = None,
+    strategy_used: list = None,
+    tool_calls: dict = None,
+    rag_sources: list = None,
+    created_at: Optional[datetime] = None,
+) -> dict:
+    """Build a Message document in the shape the Node backend uses."""
+    created_at = created_at or datetime.now(timezone.utc)
+    return {
+        "conversationId": conversation_id,
+        "role": role,
+        "content": content,
+        "emotion": emotion or [],
+        "strategyUsed": strategy_used or [],
+        "toolCalls": tool_calls or {},
+        "ragSources": rag_sources or [],
+        "createdAt": created_at,
+        "updatedAt": created_at,
+    }
+
+
 def save_message(
     conversation_id: str,
     role: str,
@@ -99,53 +152,209 @@ def save_message(
     """Persist a single chat message."""
     try:
         db = get_db()
-        now = datetime.now(timezone.utc)
         db.messages.insert_one(
-            {
-                "conversationId": conversation_id,
-                "role": role,
-                "content": content,
-                "emotion": emotion or [],
-                "strategyUsed": strategy_used or [],
-                "toolCalls": tool_calls or {},
-                "ragSources": rag_sources or [],
-                "createdAt": now,
-                "updatedAt": now,
-            }
+            _message_doc(
+                conversation_id,
+                role,
+                content,
+                emotion=emotion,
+                strategy_used=strategy_used,
+                tool_calls=tool_calls,
+                rag_sources=rag_sources,
+            )
         )
     except PyMongoError as exc:
         logger.error("[DB] save_message error: %s", exc)
 
 
+def save_messages_batch(messages: list) -> int:
+    """
+    Persist chat messages from any number of conversations in two round trips:
+    one insert_many for the messages and one bulk_write that bumps lastMessageAt
+    once per conversation.
+    Each item holds save_message's keyword arguments plus `created_at`.
+    Returns the number of messages written.
+    """
+    if not messages:
+        return 0
+    try:
+        db = get_db()
+        docs = [_message_doc(**m) for m in messages]
+        db.messages.insert_many(docs, ordered=False)
+        updates = _conversation_updates(docs)
+        if updates:
+            db.conversations.bulk_write(updates, ordered=False)
+        return len(docs)
+    except PyMongoError as exc:
+        logger.error("[DB] save_messages_batch error: %s", exc)
+        return 0
+
+
+def _conversation_updates(docs: list) -> list:
+    """One UpdateOne per conversation, bumping lastMessageAt to its newest message."""
+    last_message_at = {}
+    for doc in docs:
+        cid = doc["conversationId"]
+        last_message_at[cid] = max(doc["createdAt"], last_message_at.get(cid, doc["createdAt"]))
+
+    updates = []
+    for cid, at in last_message_at.items():
+        oid = _conversation_oid(cid)
+        if oid is not None:
+            updates.append(
+                UpdateOne({"_id": oid}, {"$set": {"lastMessageAt": at, "updatedAt": at}})
+            )
+    return updates
+
+
+_RECENT_MESSAGE_FIELDS = {"_id": 0, "role": 1, "content": 1, "emotion": 1, "strategyUsed": 1}
+
+
+def get_recent_messages(conversation_id: str, limit: int = 20) -> list:
+    """
+    Return the last `limit` messages of a conversation, oldest first.
+    Served by the {conversationId, createdAt} index in a single query.
+    """
+    try:
+        db = get_db()
+        docs = list(
+            db.messages.find(
+                {"conversationId": conversation_id}, _RECENT_MESSAGE_FIELDS
+            ).sort("createdAt", -1).limit(limit)
+        )
+        docs.reverse()
+        return docs
+    except PyMongoError as exc:
+        logger.error("[DB] get_recent_messages error: %s", exc)
+        return []
+
+
 # ---------------------------------------------------------------------------
 # Tasks
 # ---------------------------------------------------------------------------
 
+def _task_doc(user_id: str, conversation_id: str, task_data: dict) -> dict:
+    """Build a Task document from TaskBot's snake_case task dict."""
+    now = datetime.now(timezone.utc)
+    return {
+        "userId": user_id,
+        "conversationId": conversation_id,
+        "taskName": task_data.get("task_name", "Therapy Task"),
+        "description": task_data.get("description", ""),
+        "reasonForCreation": task_data.get("reason_for_creation", ""),
+        "taskType": task_data.get("task_type", "checkmark"),
+        "difficulty": task_data.get("difficulty", "easy"),
+        "progress": 0,
+        "totalCount": task_data.get("total_count", None),
+        "recurringHours": task_data.get("recurring_hours", 0),
+        "nextDueAt": None,
+        "createdBy": "companion",
+        "completed": False,
+        "completedAt": None,
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+
+def _task_from_doc(d: dict) -> dict:
+    """Map camelCase DB fields → snake_case Task model fields."""
+    return {
+        "task_name": d.get("taskName", ""),
+        "task_type": d.get("taskType", "checkmark"),
+        "reason_for_task_creation": d.get("reasonForCreation", ""),
+        "description": d.get("description", ""),
+        "difficulty": d.get("difficulty", "easy"),
+        "recurring": d.get("recurringHours", 0),
+        "completed": d.get("progress", 0),
+        "total_count": d.get("totalCount"),
+    }
+
+
+_ACTIVE_TASK_FIELDS = {
+    "_id": 0, "taskName": 1, "description": 1, "taskType": 1,
+    "reasonForCreation": 1, "difficulty": 1, "recurringHours": 1,
+    "progress": 1, "totalCount": 1,
+}
+_ACTIVE_TASK_LIMIT = 20
+
+TASK_CACHE_TTL_S = float(os.getenv("TASK_CACHE_TTL_S", "120"))
+TASK_CACHE_MAX_USERS = int(os.getenv("TASK_CACHE_MAX_USERS", "5000"))
+
+
+class _TaskCache:
+    """
+    TTL + LRU cache of each user's active task list, already mapped to
+    Task-compatible dicts. Writes made through this module update it in place;
+    changes made elsewhere are picked up on expiry, or sooner via
+    invalidate_user_tasks / watch_task_changes.
+    """
+
+    def __init__(self, ttl_s: float, max_users: int):
+        self.ttl_s = ttl_s
+        self.max_users = max_users
+        # user_id -> (expires_at, tasks), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every write, so a fill that raced a write is dropped
+        self.epoch = 0
+
+    def get(self, user_id) -> Optional[list]:
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(entry[1])
+
+    def fill(self, user_id, tasks: list, epoch: int):
+        if self.ttl_s <= 0:
+            return
+        key = str(user_id)
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_s, list(tasks))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def add(self, user_id, task: dict):
+        """Put a newly created task at the front of a cached list."""
+        key = str(user_id)
+        with self._lock:
+            self.epoch += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], [task, *entry[1]][:_ACTIVE_TASK_LIMIT])
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self.epoch += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+
+_task_cache = _TaskCache(TASK_CACHE_TTL_S, TASK_CACHE_MAX_USERS)
+
+
+def invalidate_user_tasks(user_id: Optional[str] = None):
+    """Drop a user's cached task list (or everyone's if user_id is None)."""
+    _task_cache.invalidate(user_id)
+
+
 def save_task(user_id: str, conversation_id: str, task_data: dict):
     """Persist an AI-created therapy task."""
     try:
         db = get_db()
-        now = datetime.now(timezone.utc)
-        db.tasks.insert_one(
-            {
-                "userId": user_id,
-                "conversationId": conversation_id,
-                "taskName": task_data.get("task_name", "Therapy Task"),
-                "description": task_data.get("description", ""),
-                "reasonForCreation": task_data.get("reason_for_creation", ""),
-                "taskType": task_data.get("task_type", "checkmark"),
-                "difficulty": task_data.get("difficulty", "easy"),
-                "progress": 0,
-                "totalCount": task_data.get("total_count", None),
-                "recurringHours": task_data.get("recurring_hours", 0),
-                "nextDueAt": None,
-                "createdBy": "companion",
-                "completed": False,
-                "completedAt": None,
-                "createdAt": now,
-                "updatedAt": now,
-            }
-        )
+        doc = _task_doc(user_id, conversation_id, task_data)
+        db.tasks.insert_one(doc)
+        _task_cache.add(user_id, _task_from_doc(doc))
         logger.info("[DB] Task saved for user %s", user_id)
     except PyMongoError as exc:
         logger.error("[DB] save_task error: %s", exc)
@@ -154,31 +363,22 @@ def save_task(user_id: str, conversation_id: str, task_data: dict):
 def get_user_tasks(user_id: str) -> list:
     """
     Return the user's active (non-completed) tasks as a list of Task-compatible dicts
-    (snake_case keys matching TaskBot's Task model).
+    (snake_case keys matching TaskBot's Task model). Served from the task cache when
+    possible.
     """
+    cached = _task_cache.get(user_id)
+    if cached is not None:
+        return cached
+    epoch = _task_cache.epoch
     try:
         db = get_db()
         docs = list(
             db.tasks.find(
-                {"userId": user_id, "completed": False},
-                {"_id": 0, "taskName": 1, "description": 1, "taskType": 1,
-                 "reasonForCreation": 1, "difficulty": 1, "recurringHours": 1,
-                 "progress": 1, "totalCount": 1},
-            ).sort("createdAt", -1).limit(20)
+                {"userId": user_id, "completed": False}, _ACTIVE_TASK_FIELDS
+            ).sort("createdAt", -1).limit(_ACTIVE_TASK_LIMIT)
         )
-        # Map camelCase DB fields → snake_case Task model fields
-        tasks = []
-        for d in docs:
-            tasks.append({
-                "task_name": d.get("taskName", ""),
-                "task_type": d.get("taskType", "checkmark"),
-                "reason_for_task_creation": d.get("reasonForCreation", ""),
-                "description": d.get("description", ""),
-                "difficulty": d.get("difficulty", "easy"),
-                "recurring": d.get("recurringHours", 0),
-                "completed": d.get("progress", 0),
-                "total_count": d.get("totalCount"),
-            })
+        tasks = [_task_from_doc(d) for d in docs]
+        _task_cache.fill(user_id, tasks, epoch)
         return tasks
     except PyMongoError as exc:
         logger.error("[DB] get_user_tasks error: %s", exc)
@@ -189,22 +389,446 @@ def get_user_tasks(user_id: str) -> list:
 # Memories
 # ---------------------------------------------------------------------------
 
-def save_memory(user_id: str, conversation_id: str, content: str, memory_type: str = "info"):
-    """Persist an AI-captured user memory."""
+def _memory_doc(user_id: str, conversation_id: str, content: str, memory_type: str) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "userId": user_id,
+        "conversationId": conversation_id,
+        "memoryType": memory_type,
+        "content": content,
+        "embedding": [],
+        "createdAt": now,
+        "updatedAt": now,
+    }
+
+
+def save_memory(
+    user_id: str, conversation_id: str, content: str, memory_type: str = "info"
+) -> Optional[str]:
+    """Persist an AI-captured user memory. Returns its id, or None on failure."""
+    try:
+        db = get_db()
+        result = db.memories.insert_one(_memory_doc(user_id, conversation_id, content, memory_type))
+        logger.info("[DB] Memory (%s) saved for user %s", memory_type, user_id)
+        return str(result.inserted_id)
+    except PyMongoError as exc:
+        logger.error("[DB] save_memory error: %s", exc)
+        return None
+
+
+_MEMORY_FIELDS = {"content": 1, "memoryType": 1, "embedding": 1}
+# "info" memories that have not been embedded yet: no embedding, or an empty
+# one. Matching on the first element lets the {memoryType, embedding.0} index
+# answer it; an index on the whole vector would hold one key per dimension.
+_UNEMBEDDED_MEMORY_FILTER = {"memoryType": "info", "embedding.0": {"$exists": False}}
+_UNEMBEDDED_MEMORY_LIMIT = 1000
+
+
+def _memory_from_doc(d: dict) -> dict:
+    return {
+        "id": str(d["_id"]),
+        "user_id": str(d.get("userId", "")),
+        "content": d.get("content", ""),
+        "memory_type": d.get("memoryType", "info"),
+        "embedding": d.get("embedding") or [],
+    }
+
+
+def get_user_memories(user_id: str, limit: int = 500) -> list:
+    """Sync aget_user_memories, for offline jobs."""
+    try:
+        db = get_db()
+        docs = db.memories.find({"userId": user_id}, _MEMORY_FIELDS).sort("createdAt", -1).limit(limit)
+        return [_memory_from_doc(d) for d in docs]
+    except PyMongoError as exc:
+        logger.error("[DB] get_user_memories error: %s", exc)
+        return []
+
+
+def set_memory_embeddings(embeddings: list) -> int:
+    """Sync aset_memory_embeddings, for offline jobs."""
+    if not embeddings:
+        return 0
+    try:
+        db = get_db()
+        return db.memories.bulk_write(_embedding_updates(embeddings), ordered=False).modified_count
+    except PyMongoError as exc:
+        logger.error("[DB] set_memory_embeddings error: %s", exc)
+        return 0
+
+
+def _embedding_updates(embeddings: list) -> list:
+    """UpdateOne per (memory_id, vector) pair."""
+    from bson import ObjectId
+    now = datetime.now(timezone.utc)
+    return [
+        UpdateOne({"_id": ObjectId(memory_id)}, {"$set": {"embedding": list(vector), "updatedAt": now}})
+        for memory_id, vector in embeddings
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Indexes
+# ---------------------------------------------------------------------------
+
+# Compound indexes for the queries this module runs, as (collection, keys).
+# Equality fields come first, then the sort key, so each query is answered
+# from the index without an in-memory sort.
+INDEXES = [
+    # get_user_tasks: {userId, completed: False} sorted by createdAt desc
+    ("tasks", [("userId", ASCENDING), ("completed", ASCENDING), ("createdAt", DESCENDING)]),
+    # get_recent_messages: {conversationId} sorted by createdAt desc
+    ("messages", [("conversationId", ASCENDING), ("createdAt", DESCENDING)]),
+    # a user's memories, newest first
+    ("memories", [("userId", ASCENDING), ("createdAt", DESCENDING)]),
+    # aget_unembedded_memories: {memoryType: "info", embedding.0 missing}
+    ("memories", [("memoryType", ASCENDING), ("embedding.0", ASCENDING)]),
+]
+
+# Index already exists with other options / another name (e.g. created by hand)
+_INDEX_CONFLICT_CODES = {85, 86}
+
+
+def ensure_indexes():
+    """
+    Create the indexes in INDEXES if they are missing. Safe to run on every
+    startup: existing indexes are left alone and conflicts are only logged.
+    """
     try:
         db = get_db()
+    except PyMongoError as exc:
+        logger.error("[DB] ensure_indexes: %s", exc)
+        return
+    for collection, keys in INDEXES:
+        try:
+            name = db[collection].create_index(keys)
+            logger.info("[DB] Index %s.%s ready", collection, name)
+        except OperationFailure as exc:
+            if exc.code in _INDEX_CONFLICT_CODES:
+                logger.warning("[DB] Index on %s %s conflicts with an existing one: %s",
+                               collection, keys, exc)
+            else:
+                logger.error("[DB] Could not create index on %s %s: %s", collection, keys, exc)
+        except PyMongoError as exc:
+            logger.error("[DB] Could not create index on %s %s: %s", collection, keys, exc)
+
+
+def _plan_stages(plan: dict) -> list:
+    """Stage names of a query plan tree, root first."""
+    plan = plan.get("queryPlan", plan)  # SBE plans nest the tree one level down
+    stages = [plan.get("stage", "?")]
+    children = plan.get("inputStages") or ([plan["inputStage"]] if "inputStage" in plan else [])
+    for child in children:
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+def _hot_queries(db) -> list:
+    """
+    The chat path's queries as (name, cursor), filled in with ids sampled from
+    the collections so the planner sees realistic values.
+    """
+    task = db.tasks.find_one({}, {"userId": 1}) or {}
+    message = db.messages.find_one({}, {"conversationId": 1}) or {}
+    memory = db.memories.find_one({}, {"userId": 1}) or {}
+    user_id = task.get("userId", "000000000000000000000000")
+    conversation_id = message.get("conversationId", "000000000000000000000000")
+    memory_user_id = memory.get("userId", "000000000000000000000000")
+    return [
+        (
+            "get_user_tasks",
+            db.tasks.find({"userId": user_id, "completed": False}, _ACTIVE_TASK_FIELDS)
+            .sort("createdAt", -1).limit(_ACTIVE_TASK_LIMIT),
+        ),
+        (
+            "get_recent_messages",
+            db.messages.find({"conversationId": conversation_id}, _RECENT_MESSAGE_FIELDS)
+            .sort("createdAt", -1).limit(20),
+        ),
+        (
+            "user_memories",
+            db.memories.find({"userId": memory_user_id}).sort("createdAt", -1),
+        ),
+        (
+            "unembedded_memories",
+            db.memories.find(_UNEMBEDDED_MEMORY_FILTER, {**_MEMORY_FIELDS, "userId": 1})
+            .limit(_UNEMBEDDED_MEMORY_LIMIT),
+        ),
+    ]
+
+
+def explain_hot_queries() -> list:
+    """
+    Run explain() on each hot query and report its plan. A query is flagged when
+    its plan scans the whole collection (COLLSCAN) or sorts in memory (SORT).
+    """
+    db = get_db()
+    reports = []
+    for name, cursor in _hot_queries(db):
+        explain = cursor.explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        stats = explain.get("executionStats", {})
+        reports.append({
+            "query": name,
+            "stages": stages,
+            "docs_examined": stats.get("totalDocsExamined"),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "returned": stats.get("nReturned"),
+            "millis": stats.get("executionTimeMillis"),
+            "collscan": "COLLSCAN" in stages,
+            "in_memory_sort": "SORT" in stages,
+        })
+    return reports
+
+
+# ---------------------------------------------------------------------------
+# Async API
+#
+# The same operations on pymongo's AsyncMongoClient, for callers running on the
+# event loop (agent tools, history rehydration, the conversation writer). A slow
+# query only delays its own caller instead of every stream on the loop.
+# ---------------------------------------------------------------------------
+
+_async_client: Optional[AsyncMongoClient] = None
+_async_client_lock = asyncio.Lock()
+
+
+async def aget_db():
+    """Return the MongoDB database on the async client, creating the client once."""
+    global _async_client
+    if _async_client is None:
+        async with _async_client_lock:
+            if _async_client is None:
+                client = AsyncMongoClient(MONGO_URI, **_client_options())
+                try:
+                    await client.admin.command("ping")
+                except ConnectionFailure as exc:
+                    logger.error("[DB] Could not connect to MongoDB: %s", exc)
+                    await client.close()
+                    raise
+                _async_client = client
+                logger.info("[DB] Connected to MongoDB (async) at %s", MONGO_URI)
+
+    return _async_client[_db_name()]
+
+
+async def aensure_conversation(user_id: str, conversation_id: str, first_message: str = "") -> str:
+    """Async ensure_conversation."""
+    try:
+        db = await aget_db()
         now = datetime.now(timezone.utc)
-        db.memories.insert_one(
-            {
-                "userId": user_id,
-                "conversationId": conversation_id,
-                "memoryType": memory_type,
-                "content": content,
-                "embedding": [],
-                "createdAt": now,
-                "updatedAt": now,
-            }
+        oid = _conversation_oid(conversation_id)
+        if oid is None:
+            return conversation_id
+        await db.conversations.update_one(
+            {"_id": oid},
+            {"$set": {"lastMessageAt": now, "updatedAt": now}},
+        )
+        return conversation_id
+    except PyMongoError as exc:
+        logger.error("[DB] aensure_conversation error: %s", exc)
+        return conversation_id
+
+
+async def asave_message(
+    conversation_id: str,
+    role: str,
+    content: str,
+    emotion: list = None,
+    strategy_used: list = None,
+    tool_calls: dict = None,
+    rag_sources: list = None,
+):
+    """Async save_message."""
+    try:
+        db = await aget_db()
+        await db.messages.insert_one(
+            _message_doc(
+                conversation_id,
+                role,
+                content,
+                emotion=emotion,
+                strategy_used=strategy_used,
+                tool_calls=tool_calls,
+                rag_sources=rag_sources,
+            )
+        )
+    except PyMongoError as exc:
+        logger.error("[DB] asave_message error: %s", exc)
+
+
+async def asave_messages_batch(messages: list) -> int:
+    """Async save_messages_batch."""
+    if not messages:
+        return 0
+    try:
+        db = await aget_db()
+        docs = [_message_doc(**m) for m in messages]
+        await db.messages.insert_many(docs, ordered=False)
+        updates = _conversation_updates(docs)
+        if updates:
+            await db.conversations.bulk_write(updates, ordered=False)
+        return len(docs)
+    except PyMongoError as exc:
+        logger.error("[DB] asave_messages_batch error: %s", exc)
+        return 0
+
+
+async def aget_recent_messages(conversation_id: str, limit: int = 20) -> list:
+    """Async get_recent_messages."""
+    try:
+        db = await aget_db()
+        cursor = db.messages.find(
+            {"conversationId": conversation_id}, _RECENT_MESSAGE_FIELDS
+        ).sort("createdAt", -1).limit(limit)
+        docs = await cursor.to_list()
+        docs.reverse()
+        return docs
+    except PyMongoError as exc:
+        logger.error("[DB] aget_recent_messages error: %s", exc)
+        return []
+
+
+async def asave_task(user_id: str, conversation_id: str, task_data: dict):
+    """Async save_task."""
+    try:
+        db = await aget_db()
+        doc = _task_doc(user_id, conversation_id, task_data)
+        await db.tasks.insert_one(doc)
+        _task_cache.add(user_id, _task_from_doc(doc))
+        logger.info("[DB] Task saved for user %s", user_id)
+    except PyMongoError as exc:
+        logger.error("[DB] asave_task error: %s", exc)
+
+
+async def aget_user_tasks(user_id: str) -> list:
+    """Async get_user_tasks."""
+    cached = _task_cache.get(user_id)
+    if cached is not None:
+        return cached
+    epoch = _task_cache.epoch
+    try:
+        db = await aget_db()
+        cursor = db.tasks.find(
+            {"userId": user_id, "completed": False}, _ACTIVE_TASK_FIELDS
+        ).sort("createdAt", -1).limit(_ACTIVE_TASK_LIMIT)
+        tasks = [_task_from_doc(d) for d in await cursor.to_list()]
+        _task_cache.fill(user_id, tasks, epoch)
+        return tasks
+    except PyMongoError as exc:
+        logger.error("[DB] aget_user_tasks error: %s", exc)
+        return []
+
+
+async def watch_task_changes():
+    """
+    Invalidate cached task lists as tasks change anywhere (the Node backend
+    completing or deleting them, other workers creating them). Runs until
+    cancelled. Change streams need a replica set; without one this logs a
+    warning and returns, and the cache relies on its TTL.
+    """
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    try:
+        db = await aget_db()
+        async with await db.tasks.watch(pipeline, full_document="updateLookup") as stream:
+            logger.info("[DB] Watching tasks for changes")
+            async for change in stream:
+                doc = change.get("fullDocument")
+                if doc and "userId" in doc:
+                    invalidate_user_tasks(doc["userId"])
+                else:
+                    # Delete events only carry the _id, not the owner
+                    invalidate_user_tasks()
+    except OperationFailure as exc:
+        logger.warning("[DB] Task change stream unavailable, relying on the cache TTL: %s", exc)
+    except PyMongoError as exc:
+        logger.error("[DB] Task change stream stopped: %s", exc)
+
+
+async def asave_memory(
+    user_id: str, conversation_id: str, content: str, memory_type: str = "info"
+) -> Optional[str]:
+    """Async save_memory."""
+    try:
+        db = await aget_db()
+        result = await db.memories.insert_one(
+            _memory_doc(user_id, conversation_id, content, memory_type)
         )
         logger.info("[DB] Memory (%s) saved for user %s", memory_type, user_id)
+        return str(result.inserted_id)
     except PyMongoError as exc:
-        logger.error("[DB] save_memory error: %s", exc)
+        logger.error("[DB] asave_memory error: %s", exc)
+        return None
+
+
+async def aget_user_memories(user_id: str, limit: int = 500) -> list:
+    """
+    Return a user's newest `limit` memories as dicts with id, content,
+    memory_type and embedding (empty until the embedding job has run).
+    """
+    try:
+        db = await aget_db()
+        cursor = db.memories.find({"userId": user_id}, _MEMORY_FIELDS).sort(
+            "createdAt", -1
+        ).limit(limit)
+        return [_memory_from_doc(d) for d in await cursor.to_list()]
+    except PyMongoError as exc:
+        logger.error("[DB] aget_user_memories error: %s", exc)
+        return []
+
+
+async def aget_unembedded_memories(limit: int = _UNEMBEDDED_MEMORY_LIMIT) -> list:
+    """Return up to `limit` "info" memories that still have no embedding."""
+    try:
+        db = await aget_db()
+        cursor = db.memories.find(
+            _UNEMBEDDED_MEMORY_FILTER, {**_MEMORY_FIELDS, "userId": 1}
+        ).limit(limit)
+        return [_memory_from_doc(d) for d in await cursor.to_list()]
+    except PyMongoError as exc:
+        logger.error("[DB] aget_unembedded_memories error: %s", exc)
+        return []
+
+
+async def aset_memory_embeddings(embeddings: list) -> int:
+    """Store (memory_id, vector) pairs in one bulk_write. Returns the number updated."""
+    if not embeddings:
+        return 0
+    try:
+        db = await aget_db()
+        result = await db.memories.bulk_write(_embedding_updates(embeddings), ordered=False)
+        return result.modified_count
+    except PyMongoError as exc:
+        logger.error("[DB] aset_memory_embeddings error: %s", exc)
+        return 0
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MongoDB maintenance for the ML backend")
+    parser.add_argument("--ensure-indexes", action="store_true",
+                        help="Create the indexes the chat path relies on")
+    parser.add_argument("--explain", action="store_true",
+                        help="explain() the hot queries and flag collection scans")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.ensure_indexes:
+        ensure_indexes()
+    if args.explain:
+        flagged = 0
+        for report in explain_hot_queries():
+            problems = [p for p, hit in (("COLLSCAN", report["collscan"]),
+                                         ("in-memory SORT", report["in_memory_sort"])) if hit]
+            flagged += bool(problems)
+            print(f"{report['query']:<22} {' -> '.join(report['stages'])}")
+            print(f"{'':<22} keys={report['keys_examined']} docs={report['docs_examined']} "
+                  f"returned={report['returned']} {report['millis']}ms"
+                  + (f"  !! {', '.join(problems)}" if problems else ""))
+        if flagged:
+            print(f"\n{flagged} quer{'y' if flagged == 1 else 'ies'} not served by an index; "
+                  f"run with --ensure-indexes")
+            raise SystemExit(1)
+    if not (args.ensure_indexes or args.explain):
+        parser.print_help()
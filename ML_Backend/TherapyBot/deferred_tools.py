@@ -0,0 +1,130 @@
+"""
+Background execution of slow agent tools.
+
+In deferred mode a slow tool (create_therapy_task) answers the agent at once and
+its real work runs as a background task. When the reply has been streamed and
+the turn has given up its chat slot, it waits a short grace period for the
+conversation's jobs and merges the ones that finished into the tool events;
+results that take longer are handed to the conversation's next turn.
+
+A finished job is only forgotten once a turn carrying its result has been
+handed to the writer, so a turn that fails does not lose it.
+"""
+
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Job:
+    event: dict
+    task: asyncio.Task
+    submitted_at: float
+
+
+class DeferredToolRunner:
+    """Runs tool work in the background and hands the results back per conversation."""
+
+    def __init__(self, result_ttl_s: float = 3600.0):
+        # Finished results not picked up within this time are dropped
+        self.result_ttl_s = result_ttl_s
+        self._jobs: Dict[str, List[_Job]] = {}
+
+    def submit(self, conversation_id: str, name: str, args: dict, tool_call_id: str, coro):
+        """Start `coro` (the real work of tool call `tool_call_id`) for a conversation."""
+        self._prune()
+        task = asyncio.create_task(coro)
+        task.add_done_callback(lambda t: _log_failure(name, t))
+        event = {"name": name, "args": args, "id": tool_call_id, "deferred": True}
+        self._jobs.setdefault(conversation_id, []).append(
+            _Job(event=event, task=task, submitted_at=time.monotonic())
+        )
+
+    async def collect(self, conversation_id: str, timeout: float) -> List[dict]:
+        """
+        Wait up to `timeout` seconds for the conversation's jobs, then return the
+        events of those that have finished.
+        """
+        pending = [j.task for j in self._jobs.get(conversation_id, []) if not j.task.done()]
+        if pending and timeout > 0:
+            await asyncio.wait(pending, timeout=timeout)
+        return self.finished(conversation_id)
+
+    def finished(self, conversation_id: str) -> List[dict]:
+        """
+        Return the events of the conversation's finished jobs. They stay queued
+        until `forget` is called for them.
+        """
+        return [
+            {**job.event, "result": _result(job)}
+            for job in self._jobs.get(conversation_id, [])
+            if job.task.done()
+        ]
+
+    def forget(self, conversation_id: str, tool_call_ids: List[str]):
+        """Drop the finished jobs of these tool calls once their results have been delivered."""
+        ids = set(tool_call_ids)
+        jobs = [
+            j for j in self._jobs.get(conversation_id, [])
+            if not (j.task.done() and j.event["id"] in ids)
+        ]
+        if jobs:
+            self._jobs[conversation_id] = jobs
+        else:
+            self._jobs.pop(conversation_id, None)
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.result_ttl_s
+        for conversation_id in list(self._jobs):
+            jobs = [
+                j for j in self._jobs[conversation_id]
+                if not (j.task.done() and j.submitted_at < cutoff)
+            ]
+            if jobs:
+                self._jobs[conversation_id] = jobs
+            else:
+                del self._jobs[conversation_id]
+
+
+def merge_events(tool_events: List[dict], events: List[dict]):
+    """
+    Merge deferred results into a turn's tool events: an event for a tool call
+    already listed (its acknowledgement) is updated in place, others are appended.
+    """
+    by_id = {ev.get("id"): ev for ev in tool_events}
+    for event in events:
+        if event["id"] in by_id:
+            by_id[event["id"]].update(event)
+        else:
+            tool_events.append(event)
+            by_id[event["id"]] = event
+
+
+def _log_failure(name: str, task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("[DEFERRED] %s failed: %r", name, task.exception())
+
+
+def _result(job: _Job) -> str:
+    # A result may be read on several turns until it is forgotten, so failures
+    # are logged once, by the done callback
+    try:
+        return job.task.result()
+    except (Exception, asyncio.CancelledError) as exc:
+        return f"Error: {exc!r}"
+
+
+_runner: Optional[DeferredToolRunner] = None
+
+
+def get_deferred_runner() -> DeferredToolRunner:
+    """Return the process-wide DeferredToolRunner, creating it on first use."""
+    global _runner
+    if _runner is None:
+        _runner = DeferredToolRunner()
+    return _runner
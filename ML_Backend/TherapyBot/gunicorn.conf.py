@@ -0,0 +1,78 @@
+"""
+Gunicorn configuration for running the TherapyBot API in production.
+
+    gunicorn -c TherapyBot/gunicorn.conf.py        (from ML_Backend, see procfile)
+
+Each worker is a uvicorn worker serving asgi:app, so it runs TherapyAgent.chat on
+its own event loop. The app module - and with it the torch, go_emotions and
+embedding models - is imported once in the master before forking, so the workers
+share those pages copy-on-write instead of each loading its own copy. The
+TherapyAgent itself (LLM clients, Mongo and checkpoint connections) is still
+built per worker, in the app's lifespan.
+
+Environment:
+    PORT                   port to bind (default 5000)
+    WEB_CONCURRENCY        number of worker processes (default 2)
+    MAX_CONCURRENT_CHATS   chat turns each worker runs at once (read by service.py)
+    TORCH_NUM_THREADS      intra-op torch threads per worker (default: cores / workers)
+    GUNICORN_TIMEOUT       seconds before a silent worker is restarted (default 120)
+    PROMETHEUS_MULTIPROC_DIR  where workers write their metrics for /metrics to sum
+                           (default: therapybot-metrics in the temp dir, wiped on start)
+"""
+
+import gc
+import os
+import sys
+import shutil
+import tempfile
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+wsgi_app = "asgi:app"
+
+# Load the models in the master so forked workers share them
+preload_app = True
+
+# Must be set before the app (and so prometheus_client) is imported. Samples
+# left by a previous run would be added to this run's, so start empty.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "therapybot-metrics")
+)
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+# Longer than the usual proxy idle timeout so SSE connections aren't cut by us
+keepalive = 75
+
+
+def when_ready(server):
+    # Everything imported so far lives for the whole process. Moving it to the
+    # permanent generation stops the workers' GC from touching (and so copying)
+    # those pages after the fork.
+    gc.freeze()
+    server.log.info("Models preloaded, forking %d workers", workers)
+
+
+def post_fork(server, worker):
+    # Every worker would otherwise start one torch thread per core
+    if "torch" not in sys.modules:
+        return  # models are served by model_server.py (MODEL_SERVER_SOCKET)
+    import torch
+
+    threads = int(os.getenv("TORCH_NUM_THREADS", "0")) or max(
+        1, (os.cpu_count() or 1) // workers
+    )
+    torch.set_num_threads(threads)
+    server.log.info("Worker %s using %d torch threads", worker.pid, threads)
+
+
+def child_exit(server, worker):
+    # Keep a dead worker's histograms (they are cumulative) but drop its live gauges
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
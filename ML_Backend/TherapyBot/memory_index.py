@@ -0,0 +1,234 @@
+"""
+Per-user memory retrieval for the chat prompt.
+
+"info" memories are embedded by a batched background job (MemoryEmbedder) and
+held per user as an in-process matrix of unit vectors (MemoryIndex). Each turn
+ranks the user's memories against the message with one matrix-vector product
+and returns the best few that fit in MEMORY_TOKEN_BUDGET. "instruct" memories
+(how the user wants to be treated) need no embedding and are always included
+first.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+import numpy as np
+
+from TherapyBot.metrics import detach_trace, record
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "5"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "200"))
+MEMORY_MIN_SCORE = float(os.getenv("MEMORY_MIN_SCORE", "0.3"))
+MEMORY_INDEX_MAX_USERS = int(os.getenv("MEMORY_INDEX_MAX_USERS", "2000"))
+MEMORY_INDEX_TTL_S = float(os.getenv("MEMORY_INDEX_TTL_S", "600"))
+MEMORY_EMBED_BATCH_SIZE = int(os.getenv("MEMORY_EMBED_BATCH_SIZE", "32"))
+MEMORY_EMBED_INTERVAL_S = float(os.getenv("MEMORY_EMBED_INTERVAL_S", "2.0"))
+
+
+def _embeddings():
+    """The shared all-mpnet-base-v2 model (also used by the books RAG)."""
+    from RAG.embedding_service import get_embeddings
+    return get_embeddings()
+
+
+def _approx_tokens(text: str) -> int:
+    # Same ~4 characters per token estimate as count_tokens_approximately
+    return max(1, len(text) // 4)
+
+
+def _unit(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+@dataclass
+class _UserMemories:
+    expires_at: float
+    instructions: List[str] = field(default_factory=list)
+    # Embedded "info" memories; row i of `vectors` belongs to contents[i]
+    ids: List[str] = field(default_factory=list)
+    contents: List[str] = field(default_factory=list)
+    vectors: Optional[np.ndarray] = None
+
+    def add_info(self, memory_id: str, content: str, vector):
+        row = _unit([vector])
+        self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+        self.ids.append(memory_id)
+        self.contents.append(content)
+
+
+class MemoryIndex:
+    """LRU cache of per-user memory vectors, loaded from Mongo on first use."""
+
+    def __init__(
+        self,
+        top_k: int = MEMORY_TOP_K,
+        token_budget: int = MEMORY_TOKEN_BUDGET,
+        min_score: float = MEMORY_MIN_SCORE,
+        max_users: int = MEMORY_INDEX_MAX_USERS,
+        ttl_s: float = MEMORY_INDEX_TTL_S,
+    ):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.min_score = min_score
+        self.max_users = max_users
+        self.ttl_s = ttl_s
+        self._users: "OrderedDict[str, _UserMemories]" = OrderedDict()
+        self.embedder = MemoryEmbedder(self)
+
+    async def search(self, user_id: str, query: str) -> str:
+        """
+        The user's memories relevant to `query` as a bullet list within the
+        token budget, or "" if there are none.
+        """
+        entry = await self._get(str(user_id))
+        selected: List[str] = []
+        used = 0
+
+        def take(text: str) -> bool:
+            nonlocal used
+            cost = _approx_tokens(text)
+            if used + cost > self.token_budget:
+                return False
+            selected.append(text)
+            used += cost
+            return True
+
+        for text in entry.instructions:
+            take(text)
+
+        if entry.vectors is not None:
+            query_vector = await asyncio.to_thread(_embeddings().embed_query, query)
+            scores = entry.vectors @ _unit(query_vector)
+            for i in np.argsort(-scores)[: self.top_k]:
+                if scores[i] < self.min_score:
+                    break
+                take(entry.contents[i])
+
+        return "\n".join(f"- {text}" for text in selected)
+
+    def remember(self, user_id: str, memory_id: str, content: str, memory_type: str):
+        """Make a just-saved memory retrievable: instructions at once, info once embedded."""
+        if memory_type == "instruct":
+            entry = self._users.get(str(user_id))
+            if entry is not None:
+                entry.instructions.append(content)
+        else:
+            self.embedder.enqueue(
+                {"id": memory_id, "user_id": str(user_id), "content": content}
+            )
+
+    def add_embedded(self, user_id: str, memory_id: str, content: str, vector):
+        entry = self._users.get(str(user_id))
+        if entry is not None and memory_id not in entry.ids:
+            entry.add_info(memory_id, content, vector)
+
+    def invalidate(self, user_id: Optional[str] = None):
+        if user_id is None:
+            self._users.clear()
+        else:
+            self._users.pop(str(user_id), None)
+
+    async def _get(self, user_id: str) -> _UserMemories:
+        entry = self._users.get(user_id)
+        if entry is not None and entry.expires_at >= time.monotonic():
+            self._users.move_to_end(user_id)
+            return entry
+
+        from db_client import aget_user_memories
+
+        entry = _UserMemories(expires_at=time.monotonic() + self.ttl_s)
+        for memory in await aget_user_memories(user_id):
+            if memory["memory_type"] == "instruct":
+                entry.instructions.append(memory["content"])
+            elif memory["embedding"]:
+                entry.add_info(memory["id"], memory["content"], memory["embedding"])
+            else:
+                # Saved before the embedding job ran (or while it was down)
+                self.embedder.enqueue({**memory, "user_id": user_id})
+
+        self._users[user_id] = entry
+        self._users.move_to_end(user_id)
+        while len(self._users) > self.max_users:
+            self._users.popitem(last=False)
+        return entry
+
+
+class MemoryEmbedder:
+    """Embeds new "info" memories in batches, off the chat path."""
+
+    def __init__(
+        self,
+        index: MemoryIndex,
+        batch_size: int = MEMORY_EMBED_BATCH_SIZE,
+        interval_s: float = MEMORY_EMBED_INTERVAL_S,
+    ):
+        self.index = index
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, memory: dict):
+        """Queue a memory dict (id, user_id, content) for embedding."""
+        if not memory.get("id") or memory["id"] in self._queued:
+            return
+        self._queued.add(memory["id"])
+        self._queue.put_nowait(memory)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        detach_trace()
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.interval_s
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._embed(batch)
+
+    async def _embed(self, batch: List[dict]):
+        from db_client import aset_memory_embeddings
+
+        start = time.perf_counter()
+        try:
+            vectors = await asyncio.to_thread(
+                _embeddings().embed_documents, [m["content"] for m in batch]
+            )
+            await aset_memory_embeddings([(m["id"], v) for m, v in zip(batch, vectors)])
+            for memory, vector in zip(batch, vectors):
+                self.index.add_embedded(memory["user_id"], memory["id"], memory["content"], vector)
+            logger.info("[MEMORY] Embedded %d memories", len(batch))
+        except Exception as exc:
+            # Left unembedded; they are queued again the next time their user is loaded
+            logger.error("[MEMORY] Failed to embed %d memories: %s", len(batch), exc)
+        finally:
+            self._queued.difference_update(m["id"] for m in batch)
+            record("memory_embed", time.perf_counter() - start)
+
+
+_index: Optional[MemoryIndex] = None
+
+
+def get_memory_index() -> MemoryIndex:
+    """Return the process-wide MemoryIndex, creating it on first use."""
+    global _index
+    if _index is None:
+        _index = MemoryIndex()
+    return _index
@@ -0,0 +1,113 @@
+"""
+Per-stage latency tracing for the therapy chat path.
+
+Every span is observed into a Prometheus histogram (served from the API's
+/metrics endpoint) and, while a chat turn is being traced, also recorded in
+that turn's timings dict so it can be returned in the __metadata__ frame.
+
+Under gunicorn each worker is its own process and a scrape reaches whichever
+worker accepts it, so gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR: every
+process then writes its samples to files in that directory and /metrics sums
+them across all workers. Without it (the single-process Flask app) the
+histogram is kept in memory.
+"""
+
+import os
+import time
+import asyncio
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Upper bounds in seconds; +Inf is implicit
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+STAGE_LATENCY = Histogram(
+    "therapybot_stage_latency_seconds",
+    "Latency of the stages of a therapy chat turn.",
+    ["stage"],
+    buckets=DEFAULT_BUCKETS,
+)
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+_current_trace: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "therapybot_trace", default=None
+)
+
+
+def start_trace() -> Dict[str, float]:
+    """Start collecting span timings (ms) for the current chat turn."""
+    trace: Dict[str, float] = {}
+    _current_trace.set(trace)
+    return trace
+
+
+def detach_trace():
+    """
+    Stop recording into the current turn's timings. For long-lived background
+    tasks, which inherit the context of the turn that happened to start them.
+    """
+    _current_trace.set(None)
+
+
+def record(stage: str, seconds: float):
+    """Observe a finished span; repeated spans within one turn are summed."""
+    STAGE_LATENCY.labels(stage=stage).observe(seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace[stage] = round(trace.get(stage, 0.0) + seconds * 1000, 1)
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as `stage`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def traced(stage: str):
+    """Decorator form of `span` for sync and async functions."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def render_metrics() -> bytes:
+    """All metrics in the Prometheus text exposition format, summed over workers."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
@@ -0,0 +1,162 @@
+"""
+Write-behind persistence of finished chat turns.
+
+Turns are put on a bounded queue and written by a single background task, which
+groups the turns of all conversations into batches of one insert_many and one
+bulk_write. A batch is flushed once WRITE_BATCH_SIZE turns are waiting or
+WRITE_FLUSH_INTERVAL_S after its first turn arrived, and the queue is drained on
+shutdown via `close()`.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from TherapyBot.metrics import detach_trace, record
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "50"))
+WRITE_FLUSH_INTERVAL_S = float(os.getenv("WRITE_FLUSH_INTERVAL_S", "0.5"))
+WRITE_QUEUE_MAX = int(os.getenv("WRITE_QUEUE_MAX", "1000"))
+
+
+def turn_messages(
+    conversation_id: str,
+    user_message: str,
+    bot_response: str,
+    metadata: dict,
+    created_at: datetime,
+) -> List[dict]:
+    """The user and companion messages of one turn, as save_message kwargs."""
+    tool_events = metadata.get("tool_events", [])
+    # Store as { toolName: {name, args, result} } for easy lookup in frontend
+    tool_calls_obj = (
+        {ev.get("name"): ev for ev in tool_events if ev.get("name")}
+        if tool_events
+        else {}
+    )
+    return [
+        # User message (no metadata)
+        {
+            "conversation_id": conversation_id,
+            "role": "user",
+            "content": user_message,
+            "created_at": created_at,
+        },
+        # Companion message with captured metadata. Mongo dates have millisecond
+        # precision, so it is stamped 1ms later to keep the pair in order.
+        {
+            "conversation_id": conversation_id,
+            "role": "companion",
+            "content": bot_response,
+            "emotion": metadata.get("emotions", []),
+            "strategy_used": metadata.get("strategies", []),
+            "tool_calls": tool_calls_obj,
+            "rag_sources": metadata.get("rag_sources", []),
+            "created_at": created_at + timedelta(milliseconds=1),
+        },
+    ]
+
+
+class ConversationWriter:
+    """Batches chat turns from all conversations into bulk Mongo writes."""
+
+    def __init__(
+        self,
+        batch_size: int = WRITE_BATCH_SIZE,
+        flush_interval_s: float = WRITE_FLUSH_INTERVAL_S,
+        max_queue: int = WRITE_QUEUE_MAX,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        # One item per turn; None asks the writer to stop once the queue is drained
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        user_id: str,
+        conversation_id: str,
+        user_message: str,
+        bot_response: str,
+        metadata: dict,
+    ):
+        """Queue a finished turn. Waits only if the queue is full."""
+        messages = turn_messages(
+            conversation_id,
+            user_message,
+            bot_response,
+            metadata,
+            datetime.now(timezone.utc),
+        )
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait(messages)
+        except asyncio.QueueFull:
+            logger.warning(
+                "[WRITER] Queue full (%d turns), waiting to queue turn of user=%s",
+                self._queue.maxsize,
+                user_id,
+            )
+            await self._queue.put(messages)
+
+    async def close(self):
+        """Write everything still queued and stop the writer."""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(None)
+        await self._task
+
+    async def _run(self):
+        detach_trace()
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            turn = await self._queue.get()
+            if turn is None:
+                break
+            batch = list(turn)
+            turns = 1
+            deadline = loop.time() + self.flush_interval_s
+            while turns < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    turn = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if turn is None:
+                    stopping = True
+                    break
+                batch.extend(turn)
+                turns += 1
+            await self._flush(batch, turns)
+
+    async def _flush(self, batch: List[dict], turns: int):
+        from db_client import asave_messages_batch
+
+        start = time.perf_counter()
+        try:
+            written = await asave_messages_batch(batch)
+            logger.info("[WRITER] Wrote %d messages from %d turns", written, turns)
+        except Exception as exc:
+            logger.error("[WRITER] Failed to write %d turns: %s", turns, exc)
+        finally:
+            record("db_write", time.perf_counter() - start)
+
+
+_writer: Optional[ConversationWriter] = None
+
+
+def get_writer() -> ConversationWriter:
+    """Return the process-wide ConversationWriter, creating it on first use."""
+    global _writer
+    if _writer is None:
+        _writer = ConversationWriter()
+    return _writer
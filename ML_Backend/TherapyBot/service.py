@@ -0,0 +1,120 @@
+"""
+Chat turn handling shared by the TherapyBot servers (app.py for Flask,
+asgi.py for ASGI): runs a turn through the TherapyAgent, formats it as
+Server-Sent Events and queues it for persistence once streaming has finished.
+"""
+
+import os
+import json
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+from agent_stream import TherapyAgent
+from TherapyBot.deferred_tools import get_deferred_runner
+from TherapyBot.persistence import get_writer
+
+logger = logging.getLogger(__name__)
+
+# Chat turns this process runs at once; further turns wait for a free slot
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "16"))
+_chat_slots = asyncio.Semaphore(MAX_CONCURRENT_CHATS)
+
+_chatbot: Optional[TherapyAgent] = None
+
+
+def prepare_database():
+    """Create the MongoDB indexes the chat path relies on (unless MONGO_ENSURE_INDEXES=0)."""
+    if os.getenv("MONGO_ENSURE_INDEXES", "1") == "0":
+        return
+    from db_client import ensure_indexes
+    ensure_indexes()
+
+
+async def watch_external_changes():
+    """
+    Keep in-process caches in sync with changes made by other services.
+    Needs a MongoDB replica set, so it only runs with TASK_CACHE_WATCH=1.
+    """
+    if os.getenv("TASK_CACHE_WATCH", "0") != "1":
+        return
+    from db_client import watch_task_changes
+    await watch_task_changes()
+
+
+def get_chatbot() -> TherapyAgent:
+    """Return the process-wide TherapyAgent, creating it on first use."""
+    global _chatbot
+    if _chatbot is None:
+        _chatbot = TherapyAgent(task_debug=True, agent_debug=False)
+    return _chatbot
+
+
+def sse(payload: dict) -> str:
+    """Format a JSON payload as a single SSE `data:` frame."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def stream_chat(message: str, conversation_id: str, user_id: str) -> AsyncIterator[str]:
+    """
+    Run one chat turn and yield its SSE frames:
+    `{"content": ...}` per text chunk, then `{"toolEvents": [...]}` if any tools ran,
+    or `{"error": ...}` if the turn failed.
+    """
+    metadata: dict = {}
+    full_response: list = []
+    started = False
+
+    try:
+        async with _chat_slots:
+            started = True
+            try:
+                async for chunk in get_chatbot().chat(message, conversation_id, user_id):
+                    if isinstance(chunk, dict) and "__metadata__" in chunk:
+                        metadata.update(chunk["__metadata__"])
+                    else:
+                        full_response.append(chunk)
+                        yield sse({"content": chunk})
+            except Exception as e:
+                logger.error(f"Error in chat processing: {e}", exc_info=True)
+                yield sse({"error": str(e)})
+
+        # Metadata only arrives when the turn completed. Its background tools get a
+        # short grace period here, after the slot is released
+        if metadata:
+            await get_chatbot().collect_deferred(
+                conversation_id, metadata.setdefault("tool_events", [])
+            )
+
+        # Forward tool events to the client as a special SSE frame
+        if metadata.get("tool_events"):
+            yield sse({"toolEvents": metadata["tool_events"]})
+    finally:
+        # Also runs when the client disconnects and the server closes or cancels
+        # this generator: the checkpointer already holds the turn, so it must be
+        # saved too. A shielded task finishes even if this await is cancelled.
+        if started:
+            save = asyncio.create_task(
+                _save_turn(user_id, conversation_id, message, "".join(full_response), metadata)
+            )
+            _saving.add(save)
+            save.add_done_callback(_saving.discard)
+            await asyncio.shield(save)
+
+
+# Turns being handed to the writer, referenced until done
+_saving: set = set()
+
+
+async def _save_turn(
+    user_id: str, conversation_id: str, message: str, response: str, metadata: dict
+):
+    """Hand a turn to the write-behind writer, then forget the deferred results it carries."""
+    await get_writer().submit(user_id, conversation_id, message, response, metadata)
+    # The deferred results are now part of a saved turn
+    delivered = [
+        ev["id"] for ev in metadata.get("tool_events", [])
+        if ev.get("deferred") and "result" in ev
+    ]
+    if delivered:
+        get_deferred_runner().forget(conversation_id, delivered)
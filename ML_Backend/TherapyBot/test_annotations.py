@@ -0,0 +1,76 @@
+"""
+Unit tests for the per-conversation StrategyBot window (no Gemini needed).
+
+    python -m pytest TherapyBot/test_annotations.py
+"""
+
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from TherapyBot.annotations import AnnotationBuffer
+
+
+def _turn(n: int) -> list:
+    return [HumanMessage(f"question {n}", id=f"h{n}"), AIMessage(f"answer {n}", id=f"a{n}")]
+
+
+def _record(buffer: AnnotationBuffer, n: int):
+    buffer.record_turn("c", f"question {n}", f"answer {n}", [f"strategy {n}"])
+
+
+def test_window_kept_when_checkpoint_matches():
+    buffer = AnnotationBuffer()
+    checkpoint = []
+    for n in range(3):
+        if checkpoint:
+            buffer.sync("c", checkpoint)
+        _record(buffer, n)
+        checkpoint += _turn(n)
+    buffer.sync("c", checkpoint)
+
+    window = buffer.recent("c", "next")
+    # Every reply still carries the strategy it was recorded with
+    assert [m.get("strategy") for m in window if m["role"] == "sys"] == [
+        ["strategy 0"], ["strategy 1"], ["strategy 2"]
+    ]
+    assert window[-1] == {"role": "usr", "content": "next"}
+
+
+def test_reseeded_when_another_worker_added_turns():
+    buffer = AnnotationBuffer()
+    checkpoint = _turn(0)
+    buffer.sync("c", checkpoint)
+    _record(buffer, 1)
+    # Turns 1 and 2 landed in the checkpoint, but this process only saw turn 1
+    checkpoint += _turn(1) + _turn(2)
+    buffer.sync("c", checkpoint)
+
+    window = buffer.recent("c", "next")
+    assert [m["content"] for m in window] == [
+        "question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2", "next"
+    ]
+    # Rebuilt from the checkpoint, which has no annotations
+    assert all("strategy" not in m for m in window)
+
+
+def test_reseeded_when_synced_message_is_gone():
+    buffer = AnnotationBuffer()
+    buffer.sync("c", _turn(0))
+    _record(buffer, 1)
+    # e.g. another process rebuilt the thread from the stored messages
+    buffer.sync("c", [HumanMessage("question 1", id="x1"), AIMessage("answer 1", id="x2")])
+    assert [m["content"] for m in buffer.recent("c", "next")] == ["question 1", "answer 1", "next"]
+
+
+def test_window_is_bounded():
+    buffer = AnnotationBuffer(window=4)
+    for n in range(5):
+        _record(buffer, n)
+    assert [m["content"] for m in buffer.recent("c", "next")] == [
+        "question 3", "answer 3", "question 4", "answer 4", "next"
+    ]
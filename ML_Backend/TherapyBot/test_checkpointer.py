@@ -0,0 +1,125 @@
+"""
+Unit tests for the BoundedCheckpointSaver (no Mongo or Gemini needed).
+
+    python -m pytest TherapyBot/test_checkpointer.py
+"""
+
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.base import empty_checkpoint
+
+from TherapyBot.checkpointer import BoundedCheckpointSaver, CheckpointStore, SQLiteCheckpointStore
+
+
+class DictStore(CheckpointStore):
+    """In-memory CheckpointStore standing in for the shared backend."""
+
+    def __init__(self):
+        self.records = {}
+
+    def load(self, thread_id, checkpoint_ns):
+        record = self.records.get((thread_id, checkpoint_ns))
+        return record[1] if record else None
+
+    def checkpoint_id(self, thread_id, checkpoint_ns):
+        record = self.records.get((thread_id, checkpoint_ns))
+        return record[0] if record else None
+
+    def save(self, thread_id, checkpoint_ns, checkpoint_id, payload):
+        self.records[(thread_id, checkpoint_ns)] = (checkpoint_id, payload)
+
+    def delete(self, thread_id):
+        for key in [k for k in self.records if k[0] == thread_id]:
+            del self.records[key]
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _put(saver: BoundedCheckpointSaver, thread_id: str, messages: list) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    return saver.put(_config(thread_id), checkpoint, {}, {})
+
+
+def _messages(saver: BoundedCheckpointSaver, thread_id: str) -> list:
+    return saver.get_tuple(_config(thread_id)).checkpoint["channel_values"]["messages"]
+
+
+def test_lru_evicts_least_recently_used_thread():
+    store = DictStore()
+    saver = BoundedCheckpointSaver(store, max_threads=2)
+    _put(saver, "a", [HumanMessage("a")])
+    _put(saver, "b", [HumanMessage("b")])
+    saver.get_tuple(_config("a"))  # "a" is now the most recently used
+    _put(saver, "c", [HumanMessage("c")])
+
+    assert [key[0] for key in saver._cache] == ["a", "c"]
+    # Evicted threads are reloaded from the backend
+    assert _messages(saver, "b")[0].content == "b"
+
+
+def test_idle_threads_are_evicted():
+    saver = BoundedCheckpointSaver(DictStore(), idle_ttl_s=0.05)
+    _put(saver, "a", [HumanMessage("a")])
+    time.sleep(0.1)
+    _put(saver, "b", [HumanMessage("b")])
+    assert [key[0] for key in saver._cache] == ["b"]
+
+
+def test_byte_budget_trims_whole_exchanges():
+    messages = [SystemMessage("summary of earlier turns")]
+    for turn in range(20):
+        messages += [
+            HumanMessage(f"question {turn} " + "x" * 200),
+            AIMessage("", tool_calls=[{"name": "lookup", "args": {}, "id": f"call-{turn}"}]),
+            ToolMessage("y" * 200, tool_call_id=f"call-{turn}"),
+            AIMessage(f"answer {turn}"),
+        ]
+    saver = BoundedCheckpointSaver(DictStore(), max_thread_bytes=8 * 1024)
+    _put(saver, "t", messages)
+    kept = _messages(saver, "t")
+
+    assert len(kept) < len(messages)
+    # The leading summary survives and the rest starts at a user message, so
+    # no tool result is left without its call
+    assert kept[0].content == "summary of earlier turns"
+    assert kept[1].type == "human"
+    assert (len(kept) - 1) % 4 == 0
+    assert kept[-1].content == "answer 19"
+    assert len(saver._cache[("t", "")].checkpoint[1]) <= 8 * 1024
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    saver = BoundedCheckpointSaver(SQLiteCheckpointStore(path))
+    config = _put(saver, "t", [HumanMessage("hello"), AIMessage("hi there")])
+    saver.put_writes(config, [("messages", [HumanMessage("pending")])], task_id="task-1")
+
+    # A second saver (another worker) reads the same thread from the file
+    other = BoundedCheckpointSaver(SQLiteCheckpointStore(path))
+    loaded = other.get_tuple(_config("t"))
+    assert loaded.config["configurable"]["checkpoint_id"] == config["configurable"]["checkpoint_id"]
+    assert [m.content for m in loaded.checkpoint["channel_values"]["messages"]] == ["hello", "hi there"]
+    assert [(task, channel) for task, channel, _ in loaded.pending_writes] == [("task-1", "messages")]
+    assert loaded.pending_writes[0][2][0].content == "pending"
+
+    other.delete_thread("t")
+    assert saver.get_tuple(_config("t")) is None
+
+
+def test_put_writes_does_not_mutate_cached_entry():
+    saver = BoundedCheckpointSaver(DictStore())
+    config = _put(saver, "t", [HumanMessage("hello")])
+    before = saver._cache[("t", "")]
+    saver.put_writes(config, [("messages", [AIMessage("partial")])], task_id="task-1")
+
+    assert before.writes == {}
+    assert len(saver.get_tuple(config).pending_writes) == 1
@@ -0,0 +1,83 @@
+"""
+Unit tests for the background tool runner (no Gemini or Mongo needed).
+
+    python -m pytest TherapyBot/test_deferred_tools.py
+"""
+
+import os
+import sys
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from TherapyBot.deferred_tools import DeferredToolRunner, merge_events
+
+
+async def _work(result: str, delay: float = 0.0) -> str:
+    await asyncio.sleep(delay)
+    return result
+
+
+async def _fail():
+    raise RuntimeError("TaskBot unavailable")
+
+
+def test_merge_updates_acknowledgement_in_place():
+    tool_events = [{"name": "create_therapy_task", "args": {"reason": "r"}, "id": "call-1", "result": "started"}]
+    merge_events(tool_events, [
+        {"name": "create_therapy_task", "args": {"reason": "r"}, "id": "call-1", "deferred": True, "result": "task saved"},
+        {"name": "create_therapy_task", "args": {}, "id": "call-0", "deferred": True, "result": "earlier task"},
+    ])
+
+    assert [ev["id"] for ev in tool_events] == ["call-1", "call-0"]
+    assert tool_events[0]["result"] == "task saved"
+    assert tool_events[0]["deferred"] is True
+
+
+def test_finished_results_stay_until_forgotten():
+    async def scenario():
+        runner = DeferredToolRunner()
+        runner.submit("c", "create_therapy_task", {}, "call-1", _work("done"))
+        runner.submit("c", "create_therapy_task", {}, "call-2", _work("slow", delay=10))
+        first = await runner.collect("c", timeout=0.05)
+        # A turn that failed before saving reads the same result again
+        again = runner.finished("c")
+        runner.forget("c", ["call-1", "call-2"])
+        left = runner.finished("c")
+        pending = len(runner._jobs["c"])
+        runner._jobs["c"][0].task.cancel()
+        return first, again, left, pending
+
+    first, again, left, pending = asyncio.run(scenario())
+    assert [(ev["id"], ev["result"]) for ev in first] == [("call-1", "done")]
+    assert again == first
+    # forget only drops finished jobs; the slow one is still running
+    assert left == [] and pending == 1
+
+
+def test_failed_job_reports_error():
+    async def scenario():
+        runner = DeferredToolRunner()
+        runner.submit("c", "create_therapy_task", {}, "call-1", _fail())
+        return await runner.collect("c", timeout=1)
+
+    (event,) = asyncio.run(scenario())
+    assert event["result"].startswith("Error: RuntimeError")
+
+
+def test_prune_drops_expired_finished_jobs():
+    async def scenario():
+        runner = DeferredToolRunner(result_ttl_s=0.05)
+        runner.submit("old", "create_therapy_task", {}, "call-1", _work("done"))
+        runner.submit("running", "create_therapy_task", {}, "call-2", _work("slow", delay=10))
+        await asyncio.sleep(0.1)
+        # Submitting prunes results nobody picked up within result_ttl_s
+        runner.submit("new", "create_therapy_task", {}, "call-3", _work("done"))
+        conversations = sorted(runner._jobs)
+        for jobs in runner._jobs.values():
+            for job in jobs:
+                job.task.cancel()
+        return conversations
+
+    assert asyncio.run(scenario()) == ["new", "running"]
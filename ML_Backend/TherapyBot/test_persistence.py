@@ -0,0 +1,88 @@
+"""
+Unit tests for the write-behind ConversationWriter (no Mongo needed).
+
+    python -m pytest TherapyBot/test_persistence.py
+"""
+
+import os
+import sys
+import asyncio
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from TherapyBot.persistence import ConversationWriter
+
+
+class RecordingWriter(ConversationWriter):
+    """Keeps each flushed batch instead of writing it to Mongo."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.flushes = []
+
+    async def _flush(self, batch, turns):
+        self.flushes.append((turns, [message["content"] for message in batch]))
+
+
+async def _submit(writer: ConversationWriter, n: int):
+    for i in range(n):
+        await writer.submit("user", f"conversation-{i}", f"question {i}", f"answer {i}", {})
+
+
+def test_flushes_when_batch_is_full():
+    async def scenario():
+        writer = RecordingWriter(batch_size=3, flush_interval_s=60)
+        await _submit(writer, 3)
+        await asyncio.sleep(0.05)
+        return writer.flushes
+
+    flushes = asyncio.run(scenario())
+    assert flushes == [
+        (3, ["question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2"])
+    ]
+
+
+def test_flushes_after_interval():
+    async def scenario():
+        writer = RecordingWriter(batch_size=50, flush_interval_s=0.05)
+        await _submit(writer, 2)
+        await asyncio.sleep(0.01)
+        before = list(writer.flushes)
+        await asyncio.sleep(0.15)
+        return before, writer.flushes
+
+    before, after = asyncio.run(scenario())
+    assert before == []
+    assert [turns for turns, _ in after] == [2]
+
+
+def test_close_drains_queue():
+    async def scenario():
+        writer = RecordingWriter(batch_size=2, flush_interval_s=60)
+        await _submit(writer, 5)
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert [turns for turns, _ in writer.flushes] == [2, 2, 1]
+    assert writer._task.done()
+
+
+def test_turn_messages_keep_metadata():
+    async def scenario():
+        writer = RecordingWriter()
+        metadata = {
+            "emotions": ["sadness"],
+            "strategies": ["Question"],
+            "tool_events": [{"name": "create_therapy_task", "args": {}, "result": "ok"}],
+        }
+        await writer.submit("user", "conversation", "hello", "hi", metadata)
+        return writer._queue.get_nowait()
+
+    user, companion = asyncio.run(scenario())
+    assert user["role"] == "user" and user["content"] == "hello"
+    assert companion["emotion"] == ["sadness"]
+    assert companion["strategy_used"] == ["Question"]
+    assert companion["tool_calls"]["create_therapy_task"]["result"] == "ok"
+    assert companion["created_at"] > user["created_at"]
@@ -0,0 +1,72 @@
+"""
+Unit tests for the per-user task cache in db_client (no Mongo needed).
+
+    python -m pytest TherapyBot/test_task_cache.py
+"""
+
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from TherapyBot.db_client import _TaskCache
+
+
+def _task(name: str) -> dict:
+    return {"task_name": name}
+
+
+def test_entries_expire_after_ttl():
+    cache = _TaskCache(ttl_s=0.05, max_users=10)
+    cache.fill("u1", [_task("walk")], cache.epoch)
+    assert cache.get("u1") == [_task("walk")]
+
+    time.sleep(0.1)
+    assert cache.get("u1") is None
+
+
+def test_stale_load_does_not_repopulate_after_invalidation():
+    cache = _TaskCache(ttl_s=60, max_users=10)
+    # A reader notes the epoch and starts loading from Mongo...
+    epoch = cache.epoch
+    # ...meanwhile another service changes the user's tasks
+    cache.invalidate("u1")
+    cache.fill("u1", [_task("outdated")], epoch)
+    assert cache.get("u1") is None
+
+    # The next load starts after the invalidation and is kept
+    cache.fill("u1", [_task("current")], cache.epoch)
+    assert cache.get("u1") == [_task("current")]
+
+
+def test_stale_load_does_not_overwrite_added_task():
+    cache = _TaskCache(ttl_s=60, max_users=10)
+    epoch = cache.epoch
+    cache.add("u1", _task("new"))
+    cache.fill("u1", [_task("old")], epoch)
+    assert cache.get("u1") is None
+
+
+def test_add_prepends_to_cached_list():
+    cache = _TaskCache(ttl_s=60, max_users=10)
+    cache.fill("u1", [_task("walk")], cache.epoch)
+    cache.add("u1", _task("journal"))
+    assert cache.get("u1") == [_task("journal"), _task("walk")]
+
+
+def test_least_recently_used_user_is_dropped():
+    cache = _TaskCache(ttl_s=60, max_users=2)
+    cache.fill("u1", [], cache.epoch)
+    cache.fill("u2", [], cache.epoch)
+    cache.get("u1")
+    cache.fill("u3", [], cache.epoch)
+    assert cache.get("u2") is None
+    assert cache.get("u1") == [] and cache.get("u3") == []
+
+
+def test_disabled_with_zero_ttl():
+    cache = _TaskCache(ttl_s=0, max_users=10)
+    cache.fill("u1", [_task("walk")], cache.epoch)
+    assert cache.get("u1") is None
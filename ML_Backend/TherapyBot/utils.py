@@ -119,6 +119,58 @@ The following Therapy Strategy has been predicted to help the user. Use it to he
 **Detected Strategy:** {strategy_result}""",
 )
 
+# Per-turn context for the current user message. It is injected into the model
+# request only (see TurnContextMiddleware) and never stored in the conversation history.
+turn_context_prompt = PromptTemplate(
+    input_variables=[
+        "input",
+        "context",
+        "memories",
+        "emotion_result",
+        "reasoning_for_strategy",
+        "strategy_result",
+    ],
+    template="""User Message: {input}
+
+These are some book excerpts relevant to the user's question:
+{context}
+
+What you remember about the user:
+{memories}
+
+**Detected Emotions:** {emotion_result}
+**Reasoning for strategy:** {reasoning_for_strategy}
+**Predicted Strategy:** {strategy_result}""",
+)
+
+# Appended to the turn context when tools deferred in earlier turns have finished
+deferred_results_prompt = PromptTemplate(
+    input_variables=["results"],
+    template="""Background tasks you started earlier have finished:
+{results}
+Mention these to the user if relevant.""",
+)
+
+# Used by the background conversation compactor (see TherapyBot/compaction.py)
+summary_prompt = PromptTemplate(
+    template="""Summarize the conversation so far using ONLY information explicitly stated in user or assistant messages.
+
+Rules:
+- DO NOT add interpretation or assumptions.
+- DO NOT infer emotions, fears, or therapy themes unless explicitly mentioned.
+- DO NOT summarize system messages, prompts, or instructions.
+- DO NOT summarize explanations of how to summarize.
+
+
+Include ONLY:
+- User’s explicit requests.
+- Assistant’s explicit responses.
+- Tasks actually created (with difficulty if provided).
+- Any tool calls and their explicit results.
+
+"""
+)
+
 pet_prompt = PromptTemplate(
     input_variables=["response"], template="""Pet Response: {response}"""
 )
@@ -0,0 +1,153 @@
+"""
+Client for the local model server (model_server.py).
+
+Imports nothing heavier than the standard library, so processes that only
+talk to the server start without loading torch or any weights. Used in place
+of the in-process models when MODEL_SERVER_SOCKET is set:
+
+- RAG.embedding_service.get_embeddings() returns a RemoteEmbeddings,
+- EmotionBot's emotion_detection calls classify_emotions.
+
+Protocol: every message is a 4-byte big-endian length followed by that many
+bytes of UTF-8 JSON. A request is {"id", "op", "texts"} and its response
+{"id", "result"} or {"id", "error"}.
+"""
+
+import os
+import json
+import socket
+import struct
+import threading
+from typing import List, Optional, Tuple
+
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET", "")
+MODEL_SERVER_TIMEOUT_S = float(os.getenv("MODEL_SERVER_TIMEOUT_S", "30"))
+
+_HEADER = struct.Struct(">I")
+
+
+class ModelServerError(RuntimeError):
+    """The model server could not be reached or reported an error."""
+
+
+def send_message(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            raise ModelServerError("model server closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> dict:
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return json.loads(_recv_exactly(sock, size))
+
+
+class ModelClient:
+    """
+    Blocking client with one connection per thread, so threads (Flask request
+    threads, asyncio.to_thread workers) never wait on each other's requests.
+    """
+
+    def __init__(self, path: str = MODEL_SERVER_SOCKET, timeout_s: float = MODEL_SERVER_TIMEOUT_S):
+        self.path = path
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+        self._ids = 0
+        self._ids_lock = threading.Lock()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """all-mpnet-base-v2 vectors, in the order of `texts`."""
+        return self._request("embed", texts)
+
+    def classify_emotions(self, texts: List[str]) -> List[List[Tuple[str, float]]]:
+        """Top go_emotions (label, probability) pairs per text, strongest first."""
+        return [[(label, score) for label, score in scores] for scores in self._request("emotions", texts)]
+
+    def _request(self, op: str, texts: List[str]):
+        if not texts:
+            return []
+        with self._ids_lock:
+            self._ids += 1
+            request_id = self._ids
+        sock = self._connection()
+        try:
+            send_message(sock, {"id": request_id, "op": op, "texts": texts})
+            response = recv_message(sock)
+        except (OSError, ModelServerError) as exc:
+            # Drop the connection; the next request reconnects
+            self._local.sock = None
+            sock.close()
+            raise ModelServerError(f"{op} request to {self.path} failed: {exc}") from exc
+        if "error" in response:
+            raise ModelServerError(response["error"])
+        return response["result"]
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout_s)
+            try:
+                sock.connect(self.path)
+            except OSError as exc:
+                sock.close()
+                raise ModelServerError(f"cannot connect to model server at {self.path}: {exc}") from exc
+            self._local.sock = sock
+        return sock
+
+
+class RemoteEmbeddings:
+    """
+    Drop-in for RAG.embedding_service.EmbeddingService backed by the model
+    server. Duck-types LangChain's Embeddings, so Chroma accepts it.
+    """
+
+    model_name = "sentence-transformers/all-mpnet-base-v2"
+
+    def __init__(self, client: "ModelClient"):
+        self.client = client
+
+    def load(self):
+        """The weights live in the server; nothing to load."""
+        return None
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed(list(texts))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        import asyncio
+
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        import asyncio
+
+        return await asyncio.to_thread(self.embed_query, text)
+
+
+_client: Optional[ModelClient] = None
+
+
+def get_model_client() -> ModelClient:
+    """Return the process-wide ModelClient for MODEL_SERVER_SOCKET."""
+    global _client
+    if _client is None:
+        if not MODEL_SERVER_SOCKET:
+            raise ModelServerError("MODEL_SERVER_SOCKET is not set")
+        _client = ModelClient(MODEL_SERVER_SOCKET)
+    return _client
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Local model server: one copy of the embedding and emotion models per host.
+
+The TherapyBot server, utils_server.py, pair_people's user_groups_api and
+interest_sync each used to load all-mpnet-base-v2 (and TherapyBot also
+go_emotions) into their own process. This server loads them once and
+answers over a Unix socket (protocol in model_client.py). Clients start it
+once per host and set MODEL_SERVER_SOCKET to the same path.
+
+Requests from all clients are batched together:
+
+- "embed": texts arriving within EMBEDDING_BATCH_WAIT_MS of each other are
+  embedded in one call (up to EMBEDDING_SERVER_BATCH texts), with the
+  embedding service's length-sorted batching;
+- "emotions": each text goes through EmotionEngine, which micro-batches and
+  caches (EMOTION_BATCH_WAIT_MS, EMOTION_BATCH_SIZE, EMOTION_CACHE_SIZE).
+
+Models run in worker threads; set TORCH_NUM_THREADS to the cores the server
+may use.
+
+Usage:
+    python model_server.py [--socket /tmp/mitra-models.sock]
+"""
+
+import os
+import sys
+import json
+import struct
+import asyncio
+import argparse
+import logging
+from typing import List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+# The clients check this to decide whether to use the server, so the server
+# itself must load the models in-process
+os.environ.pop("MODEL_SERVER_SOCKET", None)
+
+import torch
+
+from EmotionBot.engine import get_emotion_engine
+from RAG.embedding_service import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = "/tmp/mitra-models.sock"
+EMBEDDING_SERVER_BATCH = int(os.getenv("EMBEDDING_SERVER_BATCH", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+MODEL_SERVER_MAX_MESSAGE = int(os.getenv("MODEL_SERVER_MAX_MESSAGE", str(64 << 20)))
+
+_HEADER = struct.Struct(">I")
+
+
+class EmbeddingBatcher:
+    """Merges concurrent embed requests (from any client) into one model call."""
+
+    def __init__(
+        self,
+        max_texts: int = EMBEDDING_SERVER_BATCH,
+        wait_ms: float = EMBEDDING_BATCH_WAIT_MS,
+    ):
+        self.max_texts = max_texts
+        self.wait_s = wait_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((texts, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.wait_s
+            while size < self.max_texts:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(batch[-1][0])
+            await self._embed(batch)
+
+    async def _embed(self, batch: List[Tuple[List[str], asyncio.Future]]):
+        texts = [text for request, _ in batch for text in request]
+        try:
+            vectors = await asyncio.to_thread(get_embeddings().embed, texts)
+        except Exception as exc:
+            logger.error("[MODEL SERVER] Embedding %d texts failed: %s", len(texts), exc)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        start = 0
+        for request, future in batch:
+            if not future.done():
+                future.set_result(vectors[start:start + len(request)])
+            start += len(request)
+
+
+class ModelServer:
+    def __init__(self):
+        self.embeddings = EmbeddingBatcher()
+        self.emotions = get_emotion_engine()
+
+    async def handle(self, op: str, texts: List[str]):
+        if op == "embed":
+            return await self.embeddings.embed(texts)
+        if op == "emotions":
+            return await asyncio.gather(*(self.emotions.classify(text) for text in texts))
+        if op == "ping":
+            return "pong"
+        raise ValueError(f"unknown op {op!r}")
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Requests on one connection are answered as they finish, matched by id
+        write_lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(request: dict):
+            response = {"id": request.get("id")}
+            try:
+                response["result"] = await self.handle(request.get("op"), request.get("texts") or [])
+            except Exception as exc:
+                response["error"] = f"{type(exc).__name__}: {exc}"
+            data = json.dumps(response).encode("utf-8")
+            async with write_lock:
+                writer.write(_HEADER.pack(len(data)) + data)
+                await writer.drain()
+
+        try:
+            while True:
+                (size,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+                if size > MODEL_SERVER_MAX_MESSAGE:
+                    logger.warning("[MODEL SERVER] Dropping client: %d byte message", size)
+                    break
+                request = json.loads(await reader.readexactly(size))
+                task = asyncio.create_task(answer(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass  # client went away
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+
+async def serve(path: str):
+    server = ModelServer()
+    if os.path.exists(path):
+        os.remove(path)  # left behind by a previous run
+    # Create the socket owner/group-only (0660) from the start; a chmod after
+    # binding would leave a window in which anyone could connect
+    old_umask = os.umask(0o117)
+    try:
+        unix_server = await asyncio.start_unix_server(server.serve_client, path=path)
+    finally:
+        os.umask(old_umask)
+    print(f"[MODEL SERVER] Listening on {path}")
+    async with unix_server:
+        await unix_server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve embeddings and emotions over a Unix socket")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if os.getenv("TORCH_NUM_THREADS"):
+        torch.set_num_threads(int(os.environ["TORCH_NUM_THREADS"]))
+    # Load both models before accepting connections
+    get_embeddings().load()
+    get_emotion_engine()
+    try:
+        asyncio.run(serve(args.socket))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,18 @@
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 import asyncio
-import torch
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RAG.embedding_service import get_embeddings
 
 persist_directory = "User_Embeddings"
 collection_name = "interests"
-model_name = "sentence-transformers/all-mpnet-base-v2"
 
-# 1) Create embeddings using Hugging Face Sentence Transformer
-print(f"[INFO] Using model: {model_name}")
-embeddings = HuggingFaceEmbeddings(
-    model_name=model_name,
-    model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
-)
-# Change 'device' to 'cuda' if you have a GPU and the model supports it.
+# 1) Shared all-mpnet-base-v2 embeddings, loaded on the first upload
+embeddings = get_embeddings()
+print(f"[INFO] Using model: {embeddings.model_name}")
 
 # 2) Convert the sentence into a Document
 
@@ -1,13 +1,14 @@
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
+import os
+import sys
 
-model_name = "sentence-transformers/all-mpnet-base-v2"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RAG.embedding_service import get_embeddings
 
-# 1) Create embeddings using Hugging Face Sentence Transformer
-print(f"[INFO] Using model: {model_name}")
-embeddings = HuggingFaceEmbeddings(
-    model_name=model_name, model_kwargs={"device": "cpu"}
-)
+# 1) Shared all-mpnet-base-v2 embeddings. Grouping only reads stored vectors,
+#    so the model is never actually loaded here.
+embeddings = get_embeddings()
+print(f"[INFO] Using model: {embeddings.model_name}")
 
 
 def load_user_embeddings(